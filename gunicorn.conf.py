@@ -0,0 +1,11 @@
+# gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker src:app
+import os
+
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # runs in the master for every worker that exits, killed ones included,
+    # so their in-flight and pool gauges stop being summed into /metrics
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(worker.pid)
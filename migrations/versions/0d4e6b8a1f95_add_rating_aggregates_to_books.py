@@ -0,0 +1,34 @@
+"""add rating aggregates to books
+
+Revision ID: 0d4e6b8a1f95
+Revises: 9a6d0f3c2b18
+Create Date: 2026-10-18 13:05:12.640381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel 
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0d4e6b8a1f95'
+down_revision: Union[str, Sequence[str], None] = '9a6d0f3c2b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # existing rows start at zero; fill them with `python -m src.commands backfill-ratings`
+    op.add_column('books', sa.Column('rating_count', sa.INTEGER(), server_default='0', nullable=False))
+    op.add_column('books', sa.Column('rating_sum', sa.INTEGER(), server_default='0', nullable=False))
+    op.add_column('books', sa.Column('rating_avg', sa.Float(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('books', 'rating_avg')
+    op.drop_column('books', 'rating_sum')
+    op.drop_column('books', 'rating_count')
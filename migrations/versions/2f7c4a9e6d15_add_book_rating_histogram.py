@@ -0,0 +1,52 @@
+"""add book rating histogram
+
+Revision ID: 2f7c4a9e6d15
+Revises: 8e5a1c7d3b92
+Create Date: 2026-10-18 15:47:09.236118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel 
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f7c4a9e6d15'
+down_revision: Union[str, Sequence[str], None] = '8e5a1c7d3b92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('book_rating_histogram',
+    sa.Column('book_uid', sa.UUID(), nullable=False),
+    sa.Column('stars_1', sa.INTEGER(), server_default='0', nullable=False),
+    sa.Column('stars_2', sa.INTEGER(), server_default='0', nullable=False),
+    sa.Column('stars_3', sa.INTEGER(), server_default='0', nullable=False),
+    sa.Column('stars_4', sa.INTEGER(), server_default='0', nullable=False),
+    sa.Column('stars_5', sa.INTEGER(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['book_uid'], ['books.uid'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('book_uid')
+    )
+    # same grouped query as `python -m src.commands rebuild-histograms`
+    op.execute(
+        """
+        INSERT INTO book_rating_histogram (book_uid, stars_1, stars_2, stars_3, stars_4, stars_5)
+        SELECT book_uid,
+               count(*) FILTER (WHERE ratings = 1),
+               count(*) FILTER (WHERE ratings = 2),
+               count(*) FILTER (WHERE ratings = 3),
+               count(*) FILTER (WHERE ratings = 4),
+               count(*) FILTER (WHERE ratings = 5)
+        FROM reviews
+        GROUP BY book_uid
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('book_rating_histogram')
@@ -0,0 +1,31 @@
+"""add review listing indexes
+
+Revision ID: 6b3e9f2a4c71
+Revises: 0d4e6b8a1f95
+Create Date: 2026-10-18 14:21:47.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel 
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b3e9f2a4c71'
+down_revision: Union[str, Sequence[str], None] = '0d4e6b8a1f95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_reviews_book_uid_created_at_uid', 'reviews', ['book_uid', 'created_at', 'uid'], unique=False)
+    op.create_index('ix_reviews_book_uid_ratings_created_at_uid', 'reviews', ['book_uid', 'ratings', 'created_at', 'uid'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reviews_book_uid_ratings_created_at_uid', table_name='reviews')
+    op.drop_index('ix_reviews_book_uid_created_at_uid', table_name='reviews')
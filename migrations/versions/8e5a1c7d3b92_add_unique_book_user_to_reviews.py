@@ -0,0 +1,40 @@
+"""add unique book user to reviews
+
+Revision ID: 8e5a1c7d3b92
+Revises: 6b3e9f2a4c71
+Create Date: 2026-10-18 15:02:33.504927
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel 
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e5a1c7d3b92'
+down_revision: Union[str, Sequence[str], None] = '6b3e9f2a4c71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # keep only the latest review per (book, user) before enforcing it;
+    # re-run `python -m src.commands backfill-ratings` afterwards
+    op.execute(
+        """
+        DELETE FROM reviews AS older
+        USING reviews AS newer
+        WHERE older.book_uid = newer.book_uid
+          AND older.user_uid = newer.user_uid
+          AND (older.update_at, older.uid) < (newer.update_at, newer.uid)
+        """
+    )
+    op.create_unique_constraint('uq_reviews_book_uid_user_uid', 'reviews', ['book_uid', 'user_uid'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_reviews_book_uid_user_uid', 'reviews', type_='unique')
@@ -0,0 +1,30 @@
+"""add unique title author index to books
+
+Revision ID: 9a6d0f3c2b18
+Revises: e1a9c3b57d26
+Create Date: 2026-10-18 12:20:53.774190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel 
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a6d0f3c2b18'
+down_revision: Union[str, Sequence[str], None] = 'e1a9c3b57d26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # fails if duplicate (title, author) pairs already exist; merge them first
+    op.create_index('ux_books_title_author', 'books', [sa.text('upper(title)'), sa.text('upper(author)')], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_books_title_author', table_name='books')
@@ -0,0 +1,31 @@
+"""add keyset pagination indexes to books
+
+Revision ID: b7c41e2d9f10
+Revises: 3818150036ca
+Create Date: 2026-10-18 10:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel 
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c41e2d9f10'
+down_revision: Union[str, Sequence[str], None] = '3818150036ca'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_books_created_at_uid', 'books', ['created_at', 'uid'], unique=False)
+    op.create_index('ix_books_user_uid_created_at_uid', 'books', ['user_uid', 'created_at', 'uid'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_user_uid_created_at_uid', table_name='books')
+    op.drop_index('ix_books_created_at_uid', table_name='books')
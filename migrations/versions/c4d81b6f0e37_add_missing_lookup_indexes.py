@@ -0,0 +1,39 @@
+"""add missing lookup indexes
+
+Revision ID: c4d81b6f0e37
+Revises: 2f7c4a9e6d15
+Create Date: 2026-10-18 16:38:51.772940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel 
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d81b6f0e37'
+down_revision: Union[str, Sequence[str], None] = '2f7c4a9e6d15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# books.user_uid, books.created_at and reviews.book_uid are already the
+# leading columns of ix_books_user_uid_created_at_uid, ix_books_created_at_uid
+# and uq_reviews_book_uid_user_uid / ix_reviews_book_uid_created_at_uid.
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction; it fails
+    # on duplicate emails, which then have to be merged by hand
+    with op.get_context().autocommit_block():
+        op.create_index('ux_users_email', 'users', ['email'], unique=True, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_reviews_user_uid', 'reviews', ['user_uid'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_reviews_user_uid', table_name='reviews', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ux_users_email', table_name='users', postgresql_concurrently=True, if_exists=True)
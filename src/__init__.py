@@ -2,10 +2,12 @@ from fastapi import FastAPI, status
 from src.books.routes import book_router
 from src.auth.routes import auth_router
 from src.reviews.routes import review_router
+from src.admin.routes import admin_router
 from contextlib import asynccontextmanager
 from src.db.main import init_db
 from .errors import register_all_errors
 from .middleware import register_middleware
+from .metrics import metrics_endpoint
 
 
 @asynccontextmanager
@@ -38,3 +40,5 @@ register_middleware(app)
 app.include_router(book_router, prefix=f"/{api}/{version}/books", tags=["books"])
 app.include_router(auth_router, prefix=f"/{api}/{version}/auth", tags=["auth"])
 app.include_router(review_router, prefix=f"/{api}/{version}/reviews", tags=["reviews"])
+app.include_router(admin_router, prefix=f"/{api}/{version}/admin", tags=["admin"])
+app.add_api_route("/metrics", metrics_endpoint, include_in_schema=False)
@@ -0,0 +1,78 @@
+"""Structured access logging that never blocks the event loop.
+
+Requests log through `access_logger`. Its handler only puts the record on a
+bounded queue; a listener thread formats it as JSON and writes it to stdout.
+When the queue is full, records are dropped and counted instead of making a
+request wait on a slow stdout.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+ACCESS_LOG_QUEUE_SIZE = 10_000
+
+access_logger = logging.getLogger("bookly.access")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = (
+            record.msg if isinstance(record.msg, dict) else {"message": record.getMessage()}
+        )
+        return json.dumps(
+            {"ts": round(record.created, 6), "level": record.levelname, **fields},
+            default=str,
+        )
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread and drops
+    records instead of waiting when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the stock prepare() formats on the calling thread; records stay in
+        # this process, so they can cross to the listener as they are
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler: NonBlockingQueueHandler | None = None
+
+
+def start_access_log() -> NonBlockingQueueHandler:
+    """Attach the queue handler to `access_logger` and start the writer thread"""
+    global _handler
+    if _handler is not None:
+        return _handler
+
+    writer = logging.StreamHandler(sys.stdout)
+    writer.setFormatter(JsonFormatter())
+
+    _handler = NonBlockingQueueHandler(queue.Queue(ACCESS_LOG_QUEUE_SIZE))
+    listener = QueueListener(_handler.queue, writer)
+    listener.start()
+    atexit.register(listener.stop)  # flush what is queued on shutdown
+
+    access_logger.addHandler(_handler)
+    access_logger.setLevel(logging.INFO)
+    access_logger.propagate = False
+    return _handler
+
+
+def should_log(status: int, sample_rate: float) -> bool:
+    """Keep every server error; keep other requests at `sample_rate`"""
+    return status >= 500 or sample_rate >= 1 or random.random() < sample_rate
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends
+from src.auth.dependencies import RoleChecker
+from src.db.main import engine, read_engine
+from src.db.pool import pool_status
+
+admin_router = APIRouter()
+admin_checker = Depends(RoleChecker(["admin"]))
+
+
+@admin_router.get(
+    "/pool",
+    dependencies=[admin_checker],
+    responses={
+        200: {"description": "Connection pool figures for the worker that answered"},
+        401: {"description": "Not authenticated"},
+        403: {"description": "Insufficient permissions"},
+    },
+)
+async def get_pool_status():
+    """Checked-out, idle and overflow connections plus checkout wait times,
+    for the primary pool and, when DATABASE_READ_URL is set, the replica's.
+
+    Each worker process has its own pools, so repeated calls may be answered
+    by different workers; `pid` tells them apart.
+    """
+    pools = {"primary": pool_status(engine.pool)}
+    if read_engine is not None:
+        pools["replica"] = pool_status(read_engine.pool)
+    return pools
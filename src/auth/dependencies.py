@@ -1,12 +1,14 @@
 from fastapi.security import HTTPBearer
 from fastapi import Request, HTTPException, status, Depends
 from fastapi.security.http import HTTPAuthorizationCredentials
-from .utils import decode_token
+from .utils import decode_token, ACCESS_TOKEN_EXPIRY
+from src.db.cache import TTLCache
 from src.db.redis import token_in_blocklist
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.db.main import get_session
+from src.db.main import get_primary_read_session
 from .service import UserService
-from typing import List
+from typing import List, Optional
+import time
 from src.db.models import User
 from src.errors import (
     BooklyException,
@@ -26,6 +28,23 @@ from src.errors import (
 
 user_service = UserService()
 
+# decoded claims of recently seen tokens, keyed by signature, until they expire
+verified_tokens = TTLCache(maxsize=10_000, ttl=ACCESS_TOKEN_EXPIRY)
+
+
+def cached_token_claims(token: str) -> Optional[dict]:
+    entry = verified_tokens.get(token.rpartition(".")[2])
+    # the signature covers the rest of the token; comparing it all is cheap
+    if entry is None or entry[0] != token:
+        return None
+    return entry[1]
+
+
+def cache_token_claims(token: str, token_data: dict) -> None:
+    ttl = token_data.get("exp", 0) - time.time()
+    if ttl > 0:
+        verified_tokens.set(token.rpartition(".")[2], (token, token_data), ttl=ttl)
+
 
 class TokenBearer(HTTPBearer):
     def __init__(self, auto_error=True):
@@ -48,17 +67,20 @@ class TokenBearer(HTTPBearer):
 
         token = credentialie.credentials
 
-        try:
-            token_data = decode_token(token)
-        except Exception as e:
-            raise InvalidToken()
-            # raise HTTPException(
-            #     status_code=status.HTTP_403_FORBIDDEN,
-            #     detail="Invalid or malformed token",
-            # ) from e
-
-        if not self.token_valid(token):
-            raise InvalidToken()
+        token_data = cached_token_claims(token)
+        if token_data is None:
+            try:
+                token_data = decode_token(token)
+            except Exception as e:
+                raise InvalidToken()
+                # raise HTTPException(
+                #     status_code=status.HTTP_403_FORBIDDEN,
+                #     detail="Invalid or malformed token",
+                # ) from e
+
+            if token_data is None:
+                raise InvalidToken()
+            cache_token_claims(token, token_data)
 
         if await token_in_blocklist(token_data["jti"]):
             raise InvalidToken()
@@ -74,12 +96,6 @@ class TokenBearer(HTTPBearer):
 
         return token_data
 
-    def token_valid(self, token: str) -> bool:
-
-        token_data = decode_token(token)
-
-        return token_data is not None
-
     def verify_token_data(self, token_data):
         raise NotImplementedError("please Override this method in child classes")
 
@@ -106,11 +122,15 @@ class RefreshTokenBearer(TokenBearer):
 
 async def get_current_user(
     token_details: dict = Depends(AccessTokenBearer()),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_primary_read_session),
 ):
 
-    user_email = token_details["user"]["email"]
-    user = await user_service.get_user_by_email(user_email, session)
+    """The caller's principal (uid, email, role, is_verified), usually from cache.
+
+    Misses read the primary, since they refill the principal cache.
+    """
+    user_uid = token_details["user"]["user_uid"]
+    user = await user_service.get_principal(user_uid, session)
 
     return user
 
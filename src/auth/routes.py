@@ -29,13 +29,14 @@ from .dependencies import (
 )
 from src.db.redis import add_jti_to_blocklist
 from src.config import Config
-from src.db.main import get_session
+from src.db.main import get_read_session, get_session
 from src.errors import (
     InvalidToken,
     UserAlreadyExists,
     InvalidCredentials,
     UserNotFound,
     UserUsernameExists,
+    PasswordHashingBusy,
 )
 from src.mail import mail, create_message, send_verification_email
 from src.celery_tasks import (
@@ -168,10 +169,7 @@ async def verify_user_account(token: str, session: AsyncSession = Depends(get_se
             )
 
         if not user.is_verified:
-            user.is_verified = True
-            session.add(user)
-            await session.commit()
-            await session.refresh(user)
+            await user_service.update_user(user, {"is_verified": True}, session)
 
         return {"message": "Account verified successfully"}
     except HTTPException:
@@ -223,7 +221,7 @@ async def login_users(
     user = await user_service.get_user_by_email(email, session)
 
     if user is not None:
-        password_valid = verify_password(password, user.password_hash)
+        password_valid = await verify_password(password, user.password_hash)
 
         if password_valid:
             access_token = create_access_token(
@@ -288,11 +286,13 @@ async def get_new_access_token(token_details: dict = Depends(RefreshTokenBearer(
     },
 )
 async def get_current_user(
-    user=Depends(get_current_user), _: bool = Depends(role_checker)
+    user=Depends(get_current_user),
+    _: bool = Depends(role_checker),
+    session: AsyncSession = Depends(get_read_session),
 ):
     if user is None:
         raise UserNotFound()
-    return user
+    return await user_service.get_current_user_details(user, session)
 
 
 @auth_router.get(
@@ -380,13 +380,11 @@ async def reset_account_password(
             )
 
         # Update password
-        hashed_password = generate_password_hash(new_passie)
-        user.password_hash = hashed_password
-        session.add(user)
-        await session.commit()
+        hashed_password = await generate_password_hash(new_passie)
+        await user_service.update_user(user, {"password_hash": hashed_password}, session)
 
         return {"message": "Password reset successful"}
-    except HTTPException:
+    except (HTTPException, PasswordHashingBusy):
         raise
     except Exception as e:
         raise HTTPException(
@@ -396,7 +394,7 @@ async def reset_account_password(
         if not user:
             raise UserNotFound()
 
-        password_hash = generate_password_hash(new_passie)
+        password_hash = await generate_password_hash(new_passie)
         await user_service.update_user(user, {"password_hash": password_hash}, session)
 
         return JSONResponse(
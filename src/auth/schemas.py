@@ -14,6 +14,15 @@ class UserCreateModel(BaseModel):
     password: constr(min_length=8)
 
 
+class PrincipalModel(BaseModel):
+    """What auth checks need about the caller; cached, so keep it small"""
+
+    uid: uuid.UUID
+    email: str
+    role: str
+    is_verified: bool
+
+
 class UserModel(BaseModel):
 
     uid: uuid.UUID
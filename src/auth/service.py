@@ -1,10 +1,18 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
-from .schemas import UserCreateModel
+from .schemas import UserCreateModel, PrincipalModel
 from .utils import generate_password_hash, verify_password
 from sqlmodel import select, desc
 from src.db.models import User
+from src.db.cache import TTLCache
+from src.db.redis import cache_get, cache_set, cache_delete, principal_key, PRINCIPAL_CACHE_TTL
 from sqlalchemy.orm import selectinload
 from datetime import datetime
+from uuid import UUID
+from typing import Optional
+
+# principals are checked on every authenticated request; other workers only
+# learn about invalidations through redis, so keep this TTL short
+principal_cache = TTLCache(maxsize=10_000, ttl=5)
 
 
 class UserService:
@@ -34,7 +42,7 @@ class UserService:
 
         new_user = User(**user_data_dict)
 
-        new_user.password_hash = generate_password_hash(user_data_dict["password"])
+        new_user.password_hash = await generate_password_hash(user_data_dict["password"])
         new_user.role = "user"
         session.add(new_user)
 
@@ -42,6 +50,40 @@ class UserService:
 
         return new_user
 
+    async def get_principal(
+        self, user_uid: UUID, session: AsyncSession
+    ) -> Optional[PrincipalModel]:
+        """uid, email, role and is_verified of a user, read through the local LRU and redis"""
+        key = principal_key(user_uid)
+
+        principal = principal_cache.get(key)
+        if principal is not None:
+            return principal
+
+        cached = await cache_get(key)
+        if cached is not None:
+            principal = PrincipalModel.model_validate_json(cached)
+            principal_cache.set(key, principal)
+            return principal
+
+        statement = select(User.uid, User.email, User.role, User.is_verified).where(
+            User.uid == user_uid
+        )
+        result = await session.exec(statement)
+        row = result.first()
+        if row is None:
+            return None
+
+        principal = PrincipalModel.model_validate(row._mapping)
+        await cache_set(key, principal.model_dump_json(), ex=PRINCIPAL_CACHE_TTL)
+        principal_cache.set(key, principal)
+        return principal
+
+    async def invalidate_principal(self, user_uid: UUID):
+        key = principal_key(user_uid)
+        principal_cache.pop(key)
+        await cache_delete(key)
+
     async def get_current_user_details(self, current_user: User, session: AsyncSession):
         result = await session.exec(
             select(User)
@@ -51,7 +93,7 @@ class UserService:
                 selectinload(User.reviews),
             )
         )
-        user = result.scalar_one_or_none()
+        user = result.first()
         if not user:
             return None
         else:
@@ -65,5 +107,6 @@ class UserService:
             setattr(user, k, v)
 
         await session.commit()
+        await self.invalidate_principal(user.uid)
 
         return user
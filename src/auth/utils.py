@@ -1,8 +1,12 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from itsdangerous import URLSafeTimedSerializer
 from src.config import Config
+from src.errors import PasswordHashingBusy
+import asyncio
 import jwt
+import os
 import uuid
 import logging
 
@@ -11,15 +15,50 @@ password_context = CryptContext(schemes=["bcrypt"])
 ACCESS_TOKEN_EXPIRY = 3600
 
 
-def generate_password_hash(password: str) -> str:
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool instead of the event loop.
 
-    hash = password_context.hash(password)
+    The bcrypt backend releases the GIL while hashing, so threads give real
+    parallelism across cores. At most `workers + queue_limit` calls may be in
+    flight; beyond that `PasswordHashingBusy` is raised straight away rather
+    than letting a login burst queue up unbounded.
+    """
+
+    def __init__(self, workers: int, queue_limit: int) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.capacity = self.workers + queue_limit
+        self.in_flight = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="bcrypt"
+        )
+
+    async def run(self, func, *args):
+        # only touched from the event loop, so a plain counter is enough
+        if self.in_flight >= self.capacity:
+            raise PasswordHashingBusy()
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+
+
+password_hasher = PasswordHasher(
+    Config.PASSWORD_HASH_WORKERS, Config.PASSWORD_HASH_QUEUE_LIMIT
+)
+
+
+async def generate_password_hash(password: str) -> str:
+
+    hash = await password_hasher.run(password_context.hash, password)
 
     return hash
 
 
-def verify_password(password: str, hash: str) -> bool:
-    return password_context.verify(password, hash)
+async def verify_password(password: str, hash: str) -> bool:
+    return await password_hasher.run(password_context.verify, password, hash)
 
 
 def create_access_token(
@@ -0,0 +1,128 @@
+import csv
+import json
+from typing import AsyncIterator, Tuple
+
+# content types accepted by POST /books/import
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+# longest single record accepted, including a quoted field spanning lines
+MAX_LINE_BYTES = 1024 * 1024
+
+
+class RecordError(ValueError):
+    """A single record in an import stream could not be parsed"""
+
+    pass
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes | RecordError]:
+    """Split a byte stream into raw lines without buffering the whole body.
+
+    A line longer than MAX_LINE_BYTES is yielded as a `RecordError` and the
+    rest of it is skipped, so a body without newlines cannot fill memory.
+    """
+    pending = b""
+    skipping = False
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if skipping:
+                skipping = False  # the end of the oversized line
+                continue
+            yield line
+
+        if len(pending) > MAX_LINE_BYTES:
+            if not skipping:
+                yield RecordError(f"line longer than {MAX_LINE_BYTES} bytes")
+            skipping = True
+            pending = b""
+
+    if pending and not skipping:
+        yield pending
+
+
+async def iter_text_lines(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[str | RecordError]:
+    """Decoded lines; a line that is not valid UTF-8 comes out as a `RecordError`"""
+    async for line in iter_lines(chunks):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode("utf-8-sig").rstrip("\r")
+            except UnicodeDecodeError as e:
+                line = RecordError(f"not valid UTF-8: {e.reason} at byte {e.start}")
+        yield line
+
+
+async def iter_records(
+    chunks: AsyncIterator[bytes], fmt: str
+) -> AsyncIterator[Tuple[int, dict | RecordError]]:
+    """Yield (row_number, record) pairs from a CSV or NDJSON byte stream.
+
+    Records that cannot be parsed are yielded as a `RecordError` so the caller
+    can report them and carry on with the rest of the stream.
+    """
+    row_number = 0
+
+    if fmt == "ndjson":
+        async for line in iter_text_lines(chunks):
+            if isinstance(line, RecordError):
+                row_number += 1
+                yield row_number, line
+                continue
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise RecordError("expected a JSON object")
+                yield row_number, record
+            except ValueError as e:
+                yield row_number, RecordError(str(e))
+        return
+
+    header = None
+    buffered = ""
+    async for line in iter_text_lines(chunks):
+        if isinstance(line, RecordError):
+            # the bad line may have been part of a quoted field; drop it all
+            buffered = ""
+            row_number += 1
+            yield row_number, line
+            continue
+
+        buffered = f"{buffered}\n{line}" if buffered else line
+        # a quoted field may contain newlines; wait for the closing quote
+        if buffered.count('"') % 2:
+            if len(buffered) > MAX_LINE_BYTES:
+                buffered = ""
+                row_number += 1
+                yield row_number, RecordError(
+                    f"quoted field longer than {MAX_LINE_BYTES} bytes"
+                )
+            continue
+        record, buffered = buffered, ""
+        if not record.strip():
+            continue
+
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, RecordError(
+                f"expected {len(header)} columns, got {len(values)}"
+            )
+            continue
+        yield row_number, dict(zip(header, values))
+
+    if buffered:
+        yield row_number + 1, RecordError("unterminated quoted field")
@@ -1,19 +1,54 @@
-from fastapi import APIRouter, status, Header, HTTPException, Depends
+from fastapi import (
+    APIRouter,
+    status,
+    Header,
+    HTTPException,
+    Depends,
+    Query,
+    Request,
+    Response,
+)
 
 # from src.books.books_data import books
-from .schemas import BookModel, BookUpdateModel, BookCreateModel, BookDetailModel
-from typing import Optional, List
+from .schemas import (
+    BookModel,
+    BookUpdateModel,
+    BookCreateModel,
+    BookDetailModel,
+    BookPageModel,
+    BookSearchPageModel,
+    BookSuggestionsModel,
+    BookImportReportModel,
+    BookBatchRequestModel,
+    BookBatchModel,
+)
+from typing import Optional, List, Literal
 from uuid import UUID
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.books.service import BookService
-from src.db.main import get_session
+from src.books.service import (
+    BookService,
+    BOOK_EXPORT_COLUMNS,
+    book_detail,
+    page_validators,
+)
+from src.conditional import (
+    is_conditional,
+    is_not_modified,
+    not_modified,
+    validator_headers,
+)
+from src.db.export import export_response
+from src.books.importer import IMPORT_FORMATS, iter_records
+from src.db.main import get_primary_read_session, get_read_session, get_session
+from src.db.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, MAX_SEARCH_OFFSET
 from src.auth.dependencies import AccessTokenBearer, RoleChecker
 
 book_router = APIRouter()
 book_service = BookService()
 access_token_bearer = AccessTokenBearer()
 role_checker = Depends(RoleChecker(["admin", "user"]))
-from src.errors import BookNotFound
+admin_checker = Depends(RoleChecker(["admin"]))
+from src.errors import BookNotFound, InvalidCursor
 
 # ROUTER TO GET SELECTED HEADERS FROM API
 # @book_router.get("/get_headers", status_code=status.HTTP_200_OK)
@@ -40,30 +75,34 @@ from src.errors import BookNotFound
 # ROUTER TO GET ALL BOOKS
 @book_router.get(
     "/",
-    response_model=List[BookModel],
+    response_model=BookPageModel,
     dependencies=[role_checker],
     responses={
-        200: {"description": "List of all books"},
-        400: {"description": "Bad Request - Invalid input"},
+        200: {"description": "One page of books, newest first"},
+        400: {"description": "Bad Request - Invalid input or cursor"},
         401: {"description": "Not authenticated"},
         403: {"description": "Insufficient permissions"},
     }
 )
 async def get_all_books(
-    session: AsyncSession = Depends(get_session),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
     token_details: dict = Depends(access_token_bearer),
 ):
-    books = await book_service.get_all_books(session)
+    books = await book_service.get_all_books(session, limit=limit, cursor=cursor)
     return books
 
 
 # USER BOOK DETAILS
 @book_router.get(
     "/user/{user_uid}", 
-    response_model=List[BookModel], 
+    response_model=BookPageModel, 
     dependencies=[role_checker],
     responses={
-        200: {"description": "List of user's books"},
+        200: {"description": "One page of user's books, newest first"},
+        304: {"description": "Page unchanged since the ETag / date sent"},
+        400: {"description": "Invalid cursor"},
         401: {"description": "Not authenticated"},
         403: {"description": "Insufficient permissions"},
         404: {"description": "User or books not found"},
@@ -72,18 +111,30 @@ async def get_all_books(
 )
 async def get_user_book_submission(
     user_uid: UUID,
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
     token_details: dict = Depends(access_token_bearer),
 ):
     try:
-        books = await book_service.get_user_books(user_uid, session)
-        if not books:
+        books = await book_service.get_user_books(
+            user_uid, session, limit=limit, cursor=cursor
+        )
+        if not books["items"] and cursor is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No books found for this user"
             )
+
+        etag, last_modified = page_validators(books, limit, cursor)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+
+        response.headers.update(validator_headers(etag, last_modified))
         return books
-    except HTTPException:
+    except (HTTPException, InvalidCursor):
         raise
     except Exception as e:
         raise HTTPException(
@@ -115,17 +166,8 @@ async def create_books(
     """Router to create new book instance"""
     try:
         user_id = token_details.get("user")["user_uid"]
-        
-        # Check if book with same title and author exists
-        existing_book = await book_service.get_book_by_title_and_author(
-            book_data.title, book_data.author, session
-        )
-        if existing_book:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Book with same title '{book_data.title}', and author '{book_data.author}' already exists. Cannot Create"
-            )
-            
+
+        # duplicates are rejected by the insert itself (400)
         new_book = await book_service.create_book(book_data, user_id, session)
         if not new_book:
             raise HTTPException(
@@ -151,6 +193,183 @@ async def create_books_method_not_allowed():
     )
 
 
+# ROUTER TO FETCH MANY BOOKS AT ONCE
+@book_router.post(
+    "/batch",
+    response_model=BookBatchModel,
+    dependencies=[role_checker],
+    responses={
+        200: {"description": "Requested books in request order, plus unknown uids"},
+        401: {"description": "Not authenticated"},
+        403: {"description": "Insufficient permissions"},
+        422: {"description": "Validation error"},
+    },
+)
+async def get_books_batch(
+    batch: BookBatchRequestModel,
+    session: AsyncSession = Depends(get_read_session),
+    token_details: dict = Depends(access_token_bearer),
+):
+    """Up to 100 books by uid in one query; newest reviews are null unless requested"""
+    books = await book_service.get_books_by_ids(
+        batch.uids, session, with_reviews=batch.include_reviews
+    )
+    found = {book.uid for book in books}
+
+    return {
+        "items": [
+            book_detail(book, book.reviews if batch.include_reviews else None)
+            for book in books
+        ],
+        "missing": [uid for uid in dict.fromkeys(batch.uids) if uid not in found],
+    }
+
+
+# ROUTER TO BULK IMPORT BOOKS
+@book_router.post(
+    "/import",
+    response_model=BookImportReportModel,
+    dependencies=[admin_checker],
+    responses={
+        200: {"description": "Import finished, with per-row errors and throughput"},
+        401: {"description": "Not authenticated"},
+        403: {"description": "Insufficient permissions"},
+        415: {"description": "Body must be text/csv or application/x-ndjson"},
+    },
+)
+async def import_books(
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(access_token_bearer),
+):
+    """Stream a CSV (with header row) or NDJSON feed of books into the catalogue"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    fmt = IMPORT_FORMATS.get(content_type)
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported content type, use one of: {', '.join(IMPORT_FORMATS)}",
+        )
+
+    user_id = token_details.get("user")["user_uid"]
+    records = iter_records(request.stream(), fmt)
+
+    return await book_service.import_books(records, user_id, session)
+
+
+# ROUTER TO EXPORT THE CATALOGUE
+@book_router.get(
+    "/export",
+    dependencies=[admin_checker],
+    responses={
+        200: {"description": "Every book, streamed as NDJSON or CSV"},
+        401: {"description": "Not authenticated"},
+        403: {"description": "Insufficient permissions"},
+    },
+)
+async def export_books(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    compress: bool = False,
+    session: AsyncSession = Depends(get_read_session),
+    token_details: dict = Depends(access_token_bearer),
+):
+    """Stream the whole books table without loading it into memory"""
+    return export_response(
+        book_service.stream_books(session),
+        BOOK_EXPORT_COLUMNS,
+        "books",
+        format,
+        compress,
+    )
+
+
+# ROUTER TO SEARCH BOOKS
+@book_router.get(
+    "/search",
+    response_model=BookSearchPageModel,
+    dependencies=[role_checker],
+    responses={
+        200: {"description": "Books ranked by relevance to the query"},
+        401: {"description": "Not authenticated"},
+        403: {"description": "Insufficient permissions"},
+        422: {"description": "Validation error"},
+    },
+)
+async def search_books(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+    session: AsyncSession = Depends(get_read_session),
+    token_details: dict = Depends(access_token_bearer),
+):
+    """Full-text search over title, author and publisher"""
+    return await book_service.search_books(q, session, limit=limit, offset=offset)
+
+
+# ROUTER FOR TYPEAHEAD SUGGESTIONS
+@book_router.get(
+    "/suggest",
+    response_model=BookSuggestionsModel,
+    dependencies=[role_checker],
+    responses={
+        200: {"description": "Distinct titles or authors matching the prefix"},
+        401: {"description": "Not authenticated"},
+        403: {"description": "Insufficient permissions"},
+        422: {"description": "Validation error"},
+    },
+)
+async def suggest_books(
+    q: str = Query(..., min_length=2, max_length=100),
+    field: Literal["title", "author"] = "title",
+    limit: int = Query(10, ge=1, le=25),
+    session: AsyncSession = Depends(get_read_session),
+    token_details: dict = Depends(access_token_bearer),
+):
+    """Prefix and fuzzy suggestions for the search box"""
+    suggestions = await book_service.suggest(field, q, session, limit=limit)
+    return {"field": field, "suggestions": suggestions}
+
+
+# ROUTERS FOR THE LEADERBOARDS
+@book_router.get(
+    "/top",
+    response_model=List[BookModel],
+    dependencies=[role_checker],
+    responses={
+        200: {"description": "Books with the highest average rating this week"},
+        401: {"description": "Not authenticated"},
+        403: {"description": "Insufficient permissions"},
+    },
+)
+async def top_rated_books(
+    limit: int = Query(10, ge=1, le=50),
+    session: AsyncSession = Depends(get_read_session),
+    token_details: dict = Depends(access_token_bearer),
+):
+    """Top rated this week: the average rating of the reviews written in the
+    last seven days. Only books with a few reviews in that window are ranked."""
+    return await book_service.top_rated_books(session, limit=limit)
+
+
+@book_router.get(
+    "/trending",
+    response_model=List[BookModel],
+    dependencies=[role_checker],
+    responses={
+        200: {"description": "Most reviewed books this week, recent days weighing more"},
+        401: {"description": "Not authenticated"},
+        403: {"description": "Insufficient permissions"},
+    },
+)
+async def trending_books(
+    limit: int = Query(10, ge=1, le=50),
+    session: AsyncSession = Depends(get_read_session),
+    token_details: dict = Depends(access_token_bearer),
+):
+    """Most reviewed books over the last seven days"""
+    return await book_service.trending_books(session, limit=limit)
+
+
 # ROUTER TO GET BOOK BY ID
 @book_router.get(
     "/{book_uid}", 
@@ -158,6 +377,7 @@ async def create_books_method_not_allowed():
     dependencies=[role_checker],
     responses={
         200: {"description": "Book details retrieved successfully"},
+        304: {"description": "Book unchanged since the ETag / date sent"},
         401: {"description": "Not authenticated"},
         403: {"description": "Insufficient permissions"},
         404: {"description": "Book not found"},
@@ -166,18 +386,31 @@ async def create_books_method_not_allowed():
 )
 async def get_book_by_id(
     book_uid: UUID,
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    session: AsyncSession = Depends(get_primary_read_session),
     token_details: dict = Depends(access_token_bearer),
 ) -> dict:
-    """Router to get Book by ID"""
+    """Router to get Book by ID; read from the primary, as misses fill the detail cache"""
     try:
-        book = await book_service.get_book(book_uid, session)
-        if not book:
+        if is_conditional(request):
+            # cheap validators first, so a 304 never loads the reviews
+            validators = await book_service.get_book_detail_validators(book_uid, session)
+            if validators is not None and is_not_modified(request, *validators):
+                return not_modified(*validators)
+
+        # already-serialized BookDetailModel JSON, usually straight from cache
+        detail = await book_service.get_book_detail(book_uid, session)
+        if detail is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Book not found"
             )
-        return book
+        etag, last_modified, payload = detail
+        return Response(
+            content=payload,
+            media_type="application/json",
+            headers=validator_headers(etag, last_modified),
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -1,7 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime, date
 from src.reviews.schemas import ReviewModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 import uuid
 
 
@@ -14,27 +14,72 @@ class BookModel(BaseModel):
     published_date: date
     page_count: int
     language: str
+    rating_count: int = 0
+    rating_sum: int = 0
+    rating_avg: float = 0
     created_at: datetime
     update_at: datetime
 
 class BookDetailModel(BookModel):
+    # only the newest few; page through the rest with GET /reviews/book/{uid}
     reviews: Optional[List[ReviewModel]] =[]
+    review_count: int = 0
+
+class BookPageModel(BaseModel):
+    items: List[BookModel]
+    next_cursor: Optional[str] = None
+
+class BookSearchHitModel(BookModel):
+    rank: float
+
+class BookSearchPageModel(BaseModel):
+    items: List[BookSearchHitModel]
+    next_offset: Optional[int] = None
+
+class BookImportRowErrorModel(BaseModel):
+    row: int
+    errors: List[dict]
+
+class BookImportReportModel(BaseModel):
+    received: int
+    inserted: int
+    duplicates: int
+    invalid: int
+    errors: List[BookImportRowErrorModel]
+    elapsed_seconds: float
+    rows_per_second: Optional[float] = None
+
+class BookSuggestionsModel(BaseModel):
+    field: Literal["title", "author"]
+    suggestions: List[str]
+
+class BookBatchRequestModel(BaseModel):
+    uids: List[uuid.UUID] = Field(min_length=1, max_length=100)
+    include_reviews: bool = False
+
+class BookBatchModel(BaseModel):
+    items: List[BookDetailModel]
+    missing: List[uuid.UUID]
+
+# bounds of the books columns, so a bad row fails validation and not the INSERT
+PG_INTEGER_MAX = 2**31 - 1
+
 
 class BookCreateModel(BaseModel):
 
-    title: str
-    author: str
-    publisher: str
+    title: str = Field(min_length=1, max_length=150)
+    author: str = Field(min_length=1, max_length=150)
+    publisher: str = Field(max_length=150)
     published_date: date
-    page_count: int
-    language: str
+    page_count: int = Field(ge=0, le=PG_INTEGER_MAX)
+    language: str = Field(max_length=100)
 
 
 class BookUpdateModel(BaseModel):
 
-    title: str
-    author: str
-    publisher: str
-    page_count: int
-    language: str
+    title: str = Field(min_length=1, max_length=150)
+    author: str = Field(min_length=1, max_length=150)
+    publisher: str = Field(max_length=150)
+    page_count: int = Field(ge=0, le=PG_INTEGER_MAX)
+    language: str = Field(max_length=100)
     
\ No newline at end of file
@@ -1,41 +1,414 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
-from .schemas import BookCreateModel, BookUpdateModel
+from .schemas import BookCreateModel, BookUpdateModel, BookDetailModel
 from sqlmodel import select, desc
-from src.db.models import BookModel
-from datetime import datetime
+from src.db.models import BookModel, Review, BOOK_SEARCH_CONFIG
+from src.conditional import make_etag, http_date
+from src.db.pagination import DEFAULT_PAGE_SIZE, keyset_after, build_page
+from src.db.redis import (
+    get_cached_suggestions,
+    cache_suggestions,
+    cache_get,
+    cache_set,
+    cache_delete,
+    book_detail_key,
+    remove_book_from_leaderboards,
+    today_utc,
+    top_rated_book_uids,
+    trending_book_uids,
+    utc_day,
+    BOOK_DETAIL_CACHE_TTL,
+    TRENDING_DAYS,
+)
+from src.db.cache import TTLCache
+from src.db.export import EXPORT_BATCH_SIZE
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import func, cast, or_, update, delete, any_, bindparam
+import sqlalchemy as sa
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.dialects.postgresql import REGCONFIG, ARRAY, insert
+from pydantic import ValidationError
+from collections import defaultdict
+from datetime import datetime, timedelta
+import time
 from fastapi import HTTPException, status
 from src.errors import (
     BookNotFound
 )
+from .importer import RecordError
 from uuid import UUID
+from typing import AsyncIterator, Optional
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_REPORTED_ERRORS = 100
+BOOK_EXPORT_COLUMNS = list(BookModel.model_fields)
+# the mapped columns; RETURNING BookModel would also ship the search_vector
+BOOK_COLUMNS = list(BookModel.__mapper__.columns)
+# matches the ux_books_title_author index, the conflict target for inserts
+TITLE_AUTHOR_KEY = [
+    func.upper(BookModel.__table__.c.title),
+    func.upper(BookModel.__table__.c.author),
+]
+
+# hottest book details are served from memory before redis; other workers
+# only learn about invalidations through redis, so keep this TTL short
+book_detail_cache = TTLCache(maxsize=1024, ttl=5)
+# reviews embedded in a book detail, newest first
+BOOK_DETAIL_REVIEWS = 5
+
+
+def book_detail(book: BookModel, reviews=None) -> dict:
+    """Fields of a BookDetailModel: the book, its newest reviews and how many it has"""
+    return {**book.model_dump(), "reviews": reviews, "review_count": book.rating_count}
+
+
+def book_detail_validators(update_at, rating_count, rating_sum, last_review_at):
+    """ETag and Last-Modified of a book detail.
+
+    A new or re-rated review changes the rating aggregates, and an edit to one
+    of the embedded reviews changes `last_review_at`, the newest update_at
+    among them; edits to older reviews do not change the payload.
+    """
+    etag = make_etag(update_at, rating_count, rating_sum, last_review_at)
+    last_modified = max(filter(None, (update_at, last_review_at)), default=None)
+
+    return etag, http_date(last_modified) if last_modified else None
+
+
+def rating_delta_values(count_delta, sum_delta) -> dict:
+    """SET clause moving a book's rating aggregates by a delta; deltas may be SQL expressions"""
+    new_count = BookModel.rating_count + count_delta
+    new_sum = BookModel.rating_sum + sum_delta
+
+    return {
+        "rating_count": new_count,
+        "rating_sum": new_sum,
+        "rating_avg": func.coalesce(
+            cast(new_sum, sa.Float) / cast(func.nullif(new_count, 0), sa.Float), 0
+        ),
+    }
+
+
+def page_validators(page: dict, *page_parts):
+    """ETag of a page of books, derived from the rows it holds and its next cursor.
+
+    Review writes move a book's rating fields without touching `update_at`,
+    so those are hashed per item too, and no Last-Modified is given: no
+    column of the page says when its ratings last changed.
+    """
+    etag = make_etag(
+        *page_parts,
+        page["next_cursor"],
+        *(
+            f"{book.uid}:{book.update_at}:{book.rating_count}:{book.rating_sum}"
+            for book in page["items"]
+        ),
+    )
+
+    return etag, None
+
+
+def pack_book_detail(etag: str, last_modified: Optional[str], payload: bytes) -> bytes:
+    # redis value layout: etag, last-modified and the JSON body, newline separated
+    return f"{etag}\n{last_modified or ''}\n".encode() + payload
+
+
+def unpack_book_detail(packed: bytes):
+    etag, last_modified, payload = packed.split(b"\n", 2)
+    return etag.decode(), last_modified.decode() or None, payload
 
 
 class BookService:
-    async def get_all_books(self, session: AsyncSession):
+    async def get_all_books(
+        self,
+        session: AsyncSession,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ):
+        """Return one newest-first page of books and the cursor for the next one"""
+        statement = select(BookModel)
+        statement = keyset_after(statement, BookModel.created_at, BookModel.uid, cursor)
+        statement = statement.order_by(
+            desc(BookModel.created_at), desc(BookModel.uid)
+        ).limit(limit + 1)
+        result = await session.exec(statement)
+
+        return build_page(result.all(), limit)
 
-        statement = select(BookModel).order_by(desc(BookModel.created_at))
+    async def get_user_books(
+        self,
+        user_uid: UUID,
+        session: AsyncSession,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ):
+        """Return one newest-first page of the books submitted by a user"""
+        statement = select(BookModel).where(BookModel.user_uid == user_uid)
+        statement = keyset_after(statement, BookModel.created_at, BookModel.uid, cursor)
+        statement = statement.order_by(
+            desc(BookModel.created_at), desc(BookModel.uid)
+        ).limit(limit + 1)
         result = await session.exec(statement)
 
-        return result.all()
+        return build_page(result.all(), limit)
+
+    async def stream_books(
+        self, session: AsyncSession, batch_size: int = EXPORT_BATCH_SIZE
+    ):
+        """Yield every book as batches of row mappings from a server-side cursor"""
+        statement = select(
+            *[getattr(BookModel, name) for name in BOOK_EXPORT_COLUMNS]
+        ).execution_options(yield_per=batch_size)
+        result = await session.stream(statement)
+
+        async for rows in result.mappings().partitions():
+            yield rows
 
-    async def get_user_books(self, user_uid: UUID, session: AsyncSession):
+    async def search_books(
+        self,
+        query: str,
+        session: AsyncSession,
+        limit: int = DEFAULT_PAGE_SIZE,
+        offset: int = 0,
+    ):
+        """Rank books matching a web-style search query over title, author and publisher"""
+        search_vector = BookModel.__table__.c.search_vector
+        ts_query = func.websearch_to_tsquery(cast(BOOK_SEARCH_CONFIG, REGCONFIG), query)
+        rank = func.ts_rank_cd(search_vector, ts_query).label("rank")
 
         statement = (
-            select(BookModel)
-            .where(BookModel.user_uid == user_uid)
-            .order_by(desc(BookModel.created_at))
+            select(BookModel, rank)
+            .where(search_vector.op("@@")(ts_query))
+            .order_by(desc(rank), BookModel.uid)
+            .offset(offset)
+            .limit(limit + 1)
         )
         result = await session.exec(statement)
+        rows = result.all()
+
+        return {
+            "items": [
+                {**book.model_dump(), "rank": score} for book, score in rows[:limit]
+            ],
+            "next_offset": offset + limit if len(rows) > limit else None,
+        }
 
-        return result.all()
+    async def suggest(
+        self, field: str, prefix: str, session: AsyncSession, limit: int = 10
+    ):
+        """Distinct titles or authors for a typeahead box, best matches first.
+
+        Prefix matches rank above fuzzy (trigram) matches; both are served by
+        the gin_trgm_ops indexes and popular prefixes are cached in redis.
+        """
+        prefix = prefix.strip().upper()
+        cache_key = f"suggest:{field}:{limit}:{prefix}"
 
-    async def get_book(self, book_uid: UUID, session: AsyncSession):
+        cached = await get_cached_suggestions(cache_key)
+        if cached is not None:
+            return cached
+
+        column = getattr(BookModel, field)
+        escaped = (
+            prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        )
+        starts_with = column.like(f"{escaped}%", escape="\\")
+
+        statement = (
+            select(column)
+            .where(or_(starts_with, column.op("%")(prefix)))
+            .group_by(column)
+            .order_by(
+                desc(func.bool_or(starts_with)),
+                desc(func.max(func.similarity(column, prefix))),
+                column,
+            )
+            .limit(limit)
+        )
+        result = await session.exec(statement)
+        suggestions = list(result.all())
+
+        await cache_suggestions(cache_key, suggestions)
+
+        return suggestions
+
+    async def get_book(
+        self, book_uid: UUID, session: AsyncSession, with_reviews: bool = False
+    ):
         # Ensure we compare the model column to the UUID value (column == value)
         statement = select(BookModel).where(BookModel.uid == book_uid)
         result = await session.exec(statement)
         book = result.first()
+        if book is not None and with_reviews:
+            await self.attach_newest_reviews([book], session)
         return book if book is not None else None
 
+    async def get_books_by_ids(
+        self, book_uids: list[UUID], session: AsyncSession, with_reviews: bool = False
+    ):
+        """Fetch many books in one `uid = ANY(:uids)` query, in the order asked for.
+
+        Unknown uids are skipped. Reviews, when wanted, come from a single
+        extra query for the whole batch, see `attach_newest_reviews`.
+        """
+        book_uids = list(dict.fromkeys(book_uids))
+        statement = select(BookModel).where(
+            BookModel.uid
+            == any_(bindparam("book_uids", book_uids, type_=ARRAY(sa.UUID(as_uuid=True))))
+        )
+        result = await session.exec(statement)
+        by_uid = {book.uid: book for book in result.all()}
+        books = [by_uid[uid] for uid in book_uids if uid in by_uid]
+
+        if with_reviews:
+            await self.attach_newest_reviews(books, session)
+        return books
+
+    async def attach_newest_reviews(
+        self, books: list, session: AsyncSession, per_book: int = BOOK_DETAIL_REVIEWS
+    ):
+        """Set `book.reviews` to each book's newest reviews, in one LATERAL query.
+
+        Each book reads at most `per_book` rows off the (book_uid, created_at)
+        index, however many reviews it has.
+        """
+        if not books:
+            return
+
+        newest = (
+            select(Review)
+            .where(Review.book_uid == BookModel.uid)
+            .order_by(desc(Review.created_at), desc(Review.uid))
+            .limit(per_book)
+            .lateral("newest_reviews")
+        )
+        review = aliased(Review, newest)
+        statement = (
+            select(review)
+            .select_from(BookModel)
+            .join(newest, sa.true())
+            .where(
+                BookModel.uid
+                == any_(
+                    bindparam(
+                        "book_uids",
+                        [book.uid for book in books],
+                        type_=ARRAY(sa.UUID(as_uuid=True)),
+                    )
+                )
+            )
+            .order_by(review.book_uid, desc(review.created_at), desc(review.uid))
+        )
+        result = await session.exec(statement)
+
+        reviews = defaultdict(list)
+        for row in result.all():
+            reviews[row.book_uid].append(row)
+        for book in books:
+            set_committed_value(book, "reviews", reviews[book.uid])
+
+    async def top_rated_books(self, session: AsyncSession, limit: int = 10):
+        """Highest average rating of this week's reviews, read from the redis leaderboard"""
+        uids = await top_rated_book_uids(limit)
+        return await self.get_books_by_ids([UUID(uid) for uid in uids], session)
+
+    async def trending_books(self, session: AsyncSession, limit: int = 10):
+        """Most reviewed over the last week, read from the redis leaderboard"""
+        uids = await trending_book_uids(limit)
+        return await self.get_books_by_ids([UUID(uid) for uid in uids], session)
+
+    async def leaderboard_buckets(self, session: AsyncSession) -> list:
+        """(utc day, book_uid, reviews, rating_sum) for the reviews written in
+        each of the leaderboard days, to rebuild the redis buckets"""
+        today = today_utc()
+        since = datetime.combine(
+            today - timedelta(days=TRENDING_DAYS), datetime.min.time()
+        )
+        statement = select(Review.book_uid, Review.created_at, Review.ratings).where(
+            Review.created_at >= since
+        )
+        result = await session.exec(statement)
+
+        buckets = defaultdict(lambda: [0, 0])
+        for book_uid, created_at, ratings in result.all():
+            day = utc_day(created_at)
+            if (today - day).days < TRENDING_DAYS:
+                bucket = buckets[day, book_uid]
+                bucket[0] += 1
+                bucket[1] += ratings
+
+        return [(day, uid, *totals) for (day, uid), totals in buckets.items()]
+
+    async def get_book_detail(self, book_uid: UUID, session: AsyncSession):
+        """(etag, last_modified, BookDetailModel JSON), read through the local LRU and redis"""
+        key = book_detail_key(book_uid)
+
+        detail = await self._cached_book_detail(key)
+        if detail is not None:
+            return detail
+
+        book = await self.get_book(book_uid, session, with_reviews=True)
+        if book is None:
+            return None
+
+        etag, last_modified = book_detail_validators(
+            book.update_at,
+            book.rating_count,
+            book.rating_sum,
+            max((r.update_at for r in book.reviews if r.update_at), default=None),
+        )
+        payload = (
+            BookDetailModel.model_validate(
+                book_detail(book, book.reviews), from_attributes=True
+            )
+            .model_dump_json()
+            .encode()
+        )
+        detail = (etag, last_modified, payload)
+
+        await cache_set(key, pack_book_detail(*detail), ex=BOOK_DETAIL_CACHE_TTL)
+        book_detail_cache.set(key, detail)
+        return detail
+
+    async def get_book_detail_validators(self, book_uid: UUID, session: AsyncSession):
+        """(etag, last_modified) of a book detail, without loading its reviews"""
+        detail = await self._cached_book_detail(book_detail_key(book_uid))
+        if detail is not None:
+            return detail[:2]
+
+        newest = (
+            select(Review.update_at)
+            .where(Review.book_uid == book_uid)
+            .order_by(desc(Review.created_at), desc(Review.uid))
+            .limit(BOOK_DETAIL_REVIEWS)
+            .subquery()
+        )
+        statement = select(
+            BookModel.update_at,
+            BookModel.rating_count,
+            BookModel.rating_sum,
+            select(func.max(newest.c.update_at)).scalar_subquery(),
+        ).where(BookModel.uid == book_uid)
+        result = await session.exec(statement)
+        row = result.first()
+
+        return book_detail_validators(*row) if row is not None else None
+
+    async def _cached_book_detail(self, key: str):
+        detail = book_detail_cache.get(key)
+        if detail is None:
+            packed = await cache_get(key)
+            if packed is not None:
+                detail = unpack_book_detail(packed)
+                book_detail_cache.set(key, detail)
+
+        return detail
+
+    async def invalidate_book_detail(self, book_uid: UUID):
+        key = book_detail_key(book_uid)
+        book_detail_cache.pop(key)
+        await cache_delete(key)
+
     async def get_book_by_title_and_author(self, title: str, author: str, session: AsyncSession):
         """Check if a book with the same title and author exists"""
         title = title.strip().upper()
@@ -51,62 +424,203 @@ class BookService:
         self, book_data: BookCreateModel, user_uid: UUID, session: AsyncSession
     ):
 
-        title = book_data.title.strip().upper()
-        author = book_data.author.strip().upper()
-        publisher = book_data.publisher.strip().upper()
-
-        result = await session.exec(
-            select(BookModel).where(
-                BookModel.title == title, BookModel.author == author
-            )
+        """Insert a book in one round trip, relying on the unique (title, author) index"""
+        statement = select(BookModel).from_statement(
+            insert(BookModel)
+            .values(self.book_row(book_data, user_uid))
+            .on_conflict_do_nothing(index_elements=TITLE_AUTHOR_KEY)
+            .returning(*BOOK_COLUMNS)
         )
-        existing_book = result.first()
+        result = await session.exec(statement)
+        new_book = result.scalar_one_or_none()
+        await session.commit()
 
-        if existing_book:
+        if new_book is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Book with same title '{book_data.title}', and author '{book_data.author}' already exists. Cannot Create ",
             )
 
-        new_book = BookModel(
-            title=title,
-            author=author,
-            publisher=publisher,
-            page_count=book_data.page_count,
-            published_date=book_data.published_date,
+        return new_book
+
+    async def import_books(
+        self,
+        records: AsyncIterator,
+        user_uid: UUID,
+        session: AsyncSession,
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+    ):
+        """Validate and bulk insert a stream of book records chunk by chunk.
+
+        Each chunk is a single INSERT ... ON CONFLICT DO NOTHING on the
+        normalized (title, author) pair, committed on its own, so memory use
+        depends on the chunk size and not on the size of the upload. A chunk
+        the database rejects is rolled back and its rows counted as invalid.
+        """
+        started = time.perf_counter()
+        report = {
+            "received": 0,
+            "inserted": 0,
+            "duplicates": 0,
+            "invalid": 0,
+            "errors": [],
+        }
+        chunk = []
+        chunk_row_numbers = []
+
+        def reject(row_number: int, errors):
+            report["invalid"] += 1
+            if len(report["errors"]) < IMPORT_MAX_REPORTED_ERRORS:
+                report["errors"].append({"row": row_number, "errors": errors})
+
+        async def flush():
+            try:
+                inserted = await self.bulk_insert_books(chunk, session)
+            except DBAPIError as e:
+                await session.rollback()
+                errors = [{"msg": f"chunk rejected by the database: {e.orig or e}"}]
+                for row_number in chunk_row_numbers:
+                    reject(row_number, errors)
+            else:
+                report["inserted"] += inserted
+                report["duplicates"] += len(chunk) - inserted
+            chunk.clear()
+            chunk_row_numbers.clear()
+
+        async for row_number, record in records:
+            report["received"] += 1
+            if isinstance(record, RecordError):
+                reject(row_number, [{"msg": str(record)}])
+                continue
+            try:
+                book_data = BookCreateModel.model_validate(record)
+            except ValidationError as e:
+                reject(row_number, e.errors(include_url=False, include_input=False))
+                continue
+
+            chunk.append(self.book_row(book_data, user_uid))
+            chunk_row_numbers.append(row_number)
+            if len(chunk) >= chunk_size:
+                await flush()
+
+        if chunk:
+            await flush()
+
+        elapsed = time.perf_counter() - started
+        report["elapsed_seconds"] = round(elapsed, 3)
+        report["rows_per_second"] = round(report["received"] / elapsed, 1) if elapsed else None
+
+        return report
+
+    def book_fields(self, book_data: BookCreateModel | BookUpdateModel) -> dict:
+        """The submitted fields as stored: title, author and publisher trimmed
+        and upper-cased, so (title, author) compares as the unique index does"""
+        fields = book_data.model_dump()
+        for name in ("title", "author", "publisher"):
+            fields[name] = fields[name].strip().upper()
+
+        return fields
+
+    def book_row(self, book_data: BookCreateModel, user_uid: UUID) -> dict:
+        """Column values for a new book, normalized the same way as update_book"""
+        now = datetime.now()
+
+        return {
+            **self.book_fields(book_data),
+            "user_uid": user_uid,
+            "created_at": now,
+            "update_at": now,
+        }
+
+    async def bulk_insert_books(self, rows: list[dict], session: AsyncSession) -> int:
+        """Insert many books in one statement, skipping existing (title, author) pairs"""
+        books = BookModel.__table__
+        statement = (
+            insert(books)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=TITLE_AUTHOR_KEY)
+            .returning(books.c.uid)
         )
+        result = await session.exec(statement)
+        inserted = len(result.all())
+        await session.commit()
 
-        new_book.user_uid = user_uid
+        return inserted
 
-        session.add(new_book)
+    async def backfill_rating_aggregates(self, session: AsyncSession) -> int:
+        """Recompute every book's rating aggregates from the reviews table"""
+        totals = (
+            select(
+                Review.book_uid,
+                func.count(Review.uid).label("rating_count"),
+                func.sum(Review.ratings).label("rating_sum"),
+            )
+            .group_by(Review.book_uid)
+            .subquery()
+        )
+        reset = (
+            update(BookModel)
+            .where(
+                BookModel.rating_count != 0,
+                ~select(Review.uid).where(Review.book_uid == BookModel.uid).exists(),
+            )
+            .values(rating_count=0, rating_sum=0, rating_avg=0)
+            .execution_options(synchronize_session=False)
+        )
+        recompute = (
+            update(BookModel)
+            .where(BookModel.uid == totals.c.book_uid)
+            .values(
+                rating_count=totals.c.rating_count,
+                rating_sum=totals.c.rating_sum,
+                rating_avg=cast(totals.c.rating_sum, sa.Float)
+                / cast(totals.c.rating_count, sa.Float),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await session.exec(reset)
+        result = await session.exec(recompute)
         await session.commit()
-        await session.refresh(new_book)
 
-        return new_book
+        return result.rowcount
 
     async def update_book(
         self, book_uid: UUID, update_data: BookUpdateModel, session: AsyncSession
     ):
-
-        book_to_update = await self.get_book(book_uid, session)
-
-        if book_to_update is not None:
-            update_data_dict = update_data.model_dump()
-            for k, v in update_data_dict.items():
-                setattr(book_to_update, k, v)
-
+        """UPDATE ... RETURNING in one round trip; None when the book does not exist"""
+        statement = select(BookModel).from_statement(
+            update(BookModel)
+            .where(BookModel.uid == book_uid)
+            .values(**self.book_fields(update_data), update_at=datetime.now())
+            .returning(*BOOK_COLUMNS)
+        )
+        try:
+            result = await session.exec(statement)
+            updated_book = result.scalar_one_or_none()
             await session.commit()
-            await session.refresh(book_to_update)
-            return book_to_update
-        else:
-            return None
+        except IntegrityError:
+            await session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Book with same title '{update_data.title}', and author '{update_data.author}' already exists. Cannot Update ",
+            )
+
+        if updated_book is not None:
+            await self.invalidate_book_detail(book_uid)
+        return updated_book
 
     async def delete_book(self, book_uid: UUID, session: AsyncSession):
+        """DELETE ... RETURNING uid; reviews go with it through ON DELETE CASCADE"""
+        statement = (
+            delete(BookModel).where(BookModel.uid == book_uid).returning(BookModel.uid)
+        )
+        result = await session.exec(statement)
+        deleted_uid = result.scalar_one_or_none()
+        await session.commit()
 
-        book_to_delete = await self.get_book(book_uid, session)
-        if book_to_delete:
-            await session.delete(book_to_delete)
-            await session.commit()
-            return {}
-        else:
+        if deleted_uid is None:
             return {"message": "book not found"}
+
+        await self.invalidate_book_detail(book_uid)
+        await remove_book_from_leaderboards(book_uid)
+        return {}
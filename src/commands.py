@@ -0,0 +1,65 @@
+"""One-off maintenance commands.
+
+    python -m src.commands backfill-ratings
+    python -m src.commands rebuild-leaderboards
+    python -m src.commands rebuild-histograms
+"""
+
+import argparse
+import asyncio
+
+from src.db.main import SessionLocal, engine
+from src.db.redis import load_leaderboards
+from src.books.service import BookService
+from src.reviews.service import ReviewService
+
+book_service = BookService()
+review_service = ReviewService()
+
+
+async def backfill_ratings() -> None:
+    async with SessionLocal() as session:
+        updated = await book_service.backfill_rating_aggregates(session)
+
+    print(f"recomputed rating aggregates for {updated} reviewed books")
+
+
+async def rebuild_leaderboards() -> None:
+    async with SessionLocal() as session:
+        buckets = await book_service.leaderboard_buckets(session)
+
+    await load_leaderboards(buckets)
+    print(f"loaded {len(buckets)} daily book buckets into the leaderboards")
+
+
+async def rebuild_histograms() -> None:
+    async with SessionLocal() as session:
+        rebuilt = await review_service.rebuild_rating_histograms(session)
+
+    print(f"rebuilt rating histograms for {rebuilt} reviewed books")
+
+
+COMMANDS = {
+    "backfill-ratings": backfill_ratings,
+    "rebuild-leaderboards": rebuild_leaderboards,
+    "rebuild-histograms": rebuild_histograms,
+}
+
+
+async def run(command: str) -> None:
+    try:
+        await COMMANDS[command]()
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+
+    asyncio.run(run(args.command))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,27 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Optional
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # optional read replica, used by GET routes through get_read_session
+    DATABASE_READ_URL: Optional[str] = None
+    # how long a client's reads stick to the primary after it writes
+    READ_YOUR_WRITES_SECONDS: int = 5
+    # connection pool, per worker process; recycle -1 keeps connections forever
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # set when DATABASE_URL points at PgBouncer in transaction pooling mode
+    DB_PGBOUNCER: bool = False
+    # dev/test: log statements repeated this many times in one request
+    SQL_DETECT_N_PLUS_ONE: bool = False
+    SQL_N_PLUS_ONE_THRESHOLD: int = 3
+    # share of successful requests written to the access log; 5xx always are
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0
     JWT_SECRET: str
     JWT_ALGORITHM: str
     # REDIS_HOST: str = "localhost"
@@ -19,6 +38,9 @@ class Settings(BaseSettings):
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
     DOMAIN: str
+    # bcrypt runs on a thread pool; 0 workers means one per CPU core
+    PASSWORD_HASH_WORKERS: int = 0
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, Sequence
+
+from fastapi.responses import StreamingResponse
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def encode_rows(
+    partitions: AsyncIterator[Sequence[dict]], columns: list[str], fmt: str
+) -> AsyncIterator[bytes]:
+    """Serialize batches of row mappings into NDJSON or CSV, one chunk per batch"""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue().encode()
+
+        async for rows in partitions:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([row[name] for name in columns] for row in rows)
+            yield buffer.getvalue().encode()
+        return
+
+    async for rows in partitions:
+        yield "".join(
+            json.dumps({name: row[name] for name in columns}, default=str) + "\n"
+            for row in rows
+        ).encode()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_response(
+    partitions: AsyncIterator[Sequence[dict]],
+    columns: list[str],
+    name: str,
+    fmt: str,
+    compress: bool = False,
+) -> StreamingResponse:
+    """Stream an export straight from the database cursor to the client"""
+    body = encode_rows(partitions, columns, fmt)
+    headers = {"Content-Disposition": f'attachment; filename="{name}.{fmt}"'}
+
+    if compress:
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[fmt], headers=headers)
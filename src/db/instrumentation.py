@@ -0,0 +1,80 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+sql_logger = logging.getLogger("bookly.sql")
+
+
+class QueryStats:
+    """Statements run and database time spent while serving one request"""
+
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self, track_statements: bool = False) -> None:
+        self.count = 0
+        self.seconds = 0.0
+        # SQL text -> executions, only kept when looking for N+1 patterns
+        self.statements: Optional[Counter] = Counter() if track_statements else None
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        if self.statements is not None:
+            self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> dict[str, int]:
+        """Statements run at least `threshold` times, most likely one per parent row"""
+        if self.statements is None:
+            return {}
+        return {sql: n for sql, n in self.statements.items() if n >= threshold}
+
+
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    stats = query_stats.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def _handle_error(exception_context):
+    # a failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count and time every statement the engine runs against the current request"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def report_n_plus_one(stats: QueryStats, threshold: int, path: str) -> dict[str, int]:
+    """Log statements repeated within one request; usually a lazy load in a loop"""
+    repeated = stats.repeated(threshold)
+    for statement, times in repeated.items():
+        sql_logger.warning(
+            "possible N+1 on %s: statement ran %d times: %s", path, times, statement
+        )
+    return repeated
+
+
+def server_timing(stats: QueryStats, total_seconds: float) -> str:
+    """Server-Timing header value, durations in milliseconds"""
+    return (
+        f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries", '
+        f"app;dur={total_seconds * 1000:.1f}"
+    )
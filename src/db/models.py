@@ -8,6 +8,10 @@ from datetime import datetime, date
 
 class User(SQLModel, table=True):
     __tablename__ = "users"
+    __table_args__ = (
+        # every login and signup looks users up by email
+        pg.Index("ux_users_email", "email", unique=True),
+    )
 
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
@@ -26,15 +30,17 @@ class User(SQLModel, table=True):
     is_verified: bool = Field(default=False)
 
     created_at: datetime = Field(
-        sa_column=Column(pg.TIMESTAMP(timezone=True), default=datetime.now())
+        sa_column=Column(pg.TIMESTAMP(timezone=True), default=datetime.now)
     )
     updated_at: datetime = Field(
-        sa_column=Column(pg.TIMESTAMP(timezone=True), default=datetime.now())
+        sa_column=Column(pg.TIMESTAMP(timezone=True), default=datetime.now)
     )
+    # relationships are lazy="raise": services opt in with loader options
+    # (e.g. selectinload) so a plain select never fans out into extra queries
     books: List["BookModel"] = Relationship(
         back_populates="user",
         sa_relationship_kwargs={
-            "lazy": "selectin",
+            "lazy": "raise",
             "cascade": "all, delete-orphan",
             "passive_deletes": True,
         },
@@ -42,7 +48,7 @@ class User(SQLModel, table=True):
     reviews: List["Review"] = Relationship(
         back_populates="user",
         sa_relationship_kwargs={
-            "lazy": "selectin",
+            "lazy": "raise",
             "cascade": "all, delete-orphan",
             "passive_deletes": True,
         },
@@ -57,11 +63,30 @@ import sqlalchemy as pg
 from datetime import datetime, date
 from typing import Optional
 from sqlalchemy import ForeignKey
+from sqlalchemy.dialects.postgresql import TSVECTOR
 import uuid
 
 
 class BookModel(SQLModel, table=True):
     __tablename__ = "books"
+    __table_args__ = (
+        # keyset pagination indexes, see src/db/pagination.py
+        pg.Index("ix_books_created_at_uid", "created_at", "uid"),
+        pg.Index("ix_books_user_uid_created_at_uid", "user_uid", "created_at", "uid"),
+        # trigram indexes for /books/suggest (needs the pg_trgm extension)
+        pg.Index(
+            "ix_books_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        pg.Index(
+            "ix_books_author_trgm",
+            "author",
+            postgresql_using="gin",
+            postgresql_ops={"author": "gin_trgm_ops"},
+        ),
+    )
 
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
@@ -80,17 +105,32 @@ class BookModel(SQLModel, table=True):
             nullable=False,
         )
     )
+    # rating aggregates, kept current by ReviewService in the review's transaction
+    rating_count: int = Field(
+        default=0,
+        sa_column=Column(pg.INTEGER(), nullable=False, default=0, server_default="0"),
+    )
+    rating_sum: int = Field(
+        default=0,
+        sa_column=Column(pg.INTEGER(), nullable=False, default=0, server_default="0"),
+    )
+    rating_avg: float = Field(
+        default=0,
+        sa_column=Column(pg.Float(), nullable=False, default=0, server_default="0"),
+    )
     created_at: datetime = Field(
-        sa_column=Column(pg.TIMESTAMP(timezone=True), default=datetime.now())
+        sa_column=Column(pg.TIMESTAMP(timezone=True), default=datetime.now)
     )
     update_at: datetime = Field(
-        sa_column=Column(pg.TIMESTAMP(timezone=True), default=datetime.now())
+        sa_column=Column(pg.TIMESTAMP(timezone=True), default=datetime.now)
+    )
+    user: Optional["User"] = Relationship(
+        back_populates="books", sa_relationship_kwargs={"lazy": "raise"}
     )
-    user: Optional["User"] = Relationship(back_populates="books")
     reviews: List["Review"] = Relationship(
         back_populates="books",
         sa_relationship_kwargs={
-            "lazy": "selectin",
+            "lazy": "raise",
             "cascade": "all, delete-orphan",
             "passive_deletes": True,
         },
@@ -100,8 +140,61 @@ class BookModel(SQLModel, table=True):
         return f"<Book {self.title}>"
 
 
+# Weighted full-text document behind /books/search. The column is added to
+# the table (so create_all and alembic know about it) but left unmapped, so
+# plain selects of BookModel never ship the tsvector back to the app.
+BOOK_SEARCH_CONFIG = "english"
+
+BookModel.__table__.append_column(
+    Column(
+        "search_vector",
+        TSVECTOR,
+        pg.Computed(
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(author, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(publisher, '')), 'C')",
+            persisted=True,
+        ),
+    )
+)
+pg.Index(
+    "ix_books_search_vector",
+    BookModel.__table__.c.search_vector,
+    postgresql_using="gin",
+)
+
+# one row per normalized (title, author); the target of ON CONFLICT on insert
+pg.Index(
+    "ux_books_title_author",
+    pg.func.upper(BookModel.__table__.c.title),
+    pg.func.upper(BookModel.__table__.c.author),
+    unique=True,
+)
+
+pg.event.listen(
+    SQLModel.metadata,
+    "before_create",
+    pg.DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
 class Review(SQLModel, table=True):
     __tablename__ = "reviews"
+    __table_args__ = (
+        # one review per user and book, see ReviewService.add_review_to_book
+        pg.UniqueConstraint("book_uid", "user_uid", name="uq_reviews_book_uid_user_uid"),
+        # User.reviews and the users FK cascade look reviews up by author
+        pg.Index("ix_reviews_user_uid", "user_uid"),
+        # GET /reviews/book/{uid}, newest first and highest rated first
+        pg.Index("ix_reviews_book_uid_created_at_uid", "book_uid", "created_at", "uid"),
+        pg.Index(
+            "ix_reviews_book_uid_ratings_created_at_uid",
+            "book_uid",
+            "ratings",
+            "created_at",
+            "uid",
+        ),
+    )
 
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
@@ -123,13 +216,54 @@ class Review(SQLModel, table=True):
         )
     )
     created_at: datetime = Field(
-        sa_column=Column(pg.TIMESTAMP(timezone=True), default=datetime.now())
+        sa_column=Column(pg.TIMESTAMP(timezone=True), default=datetime.now)
     )
     update_at: datetime = Field(
-        sa_column=Column(pg.TIMESTAMP(timezone=True), default=datetime.now())
+        sa_column=Column(pg.TIMESTAMP(timezone=True), default=datetime.now)
+    )
+    user: Optional[User] = Relationship(
+        back_populates="reviews", sa_relationship_kwargs={"lazy": "raise"}
+    )
+    books: Optional[BookModel] = Relationship(
+        back_populates="reviews", sa_relationship_kwargs={"lazy": "raise"}
     )
-    user: Optional[User] = Relationship(back_populates="reviews")
-    books: Optional[BookModel] = Relationship(back_populates="reviews")
 
     def __repr__(self):
         return f"<Review for {self.book_uid} by user {self.user_uid}>"
+
+
+# reviews per star rating, one row per reviewed book; kept current by the
+# review upsert and rebuilt with `python -m src.commands rebuild-histograms`
+class BookRatingHistogram(SQLModel, table=True):
+    __tablename__ = "book_rating_histogram"
+
+    book_uid: uuid.UUID = Field(
+        sa_column=Column(
+            pg.UUID(as_uuid=True),
+            ForeignKey("books.uid", ondelete="CASCADE"),
+            primary_key=True,
+        )
+    )
+    stars_1: int = Field(
+        default=0,
+        sa_column=Column(pg.INTEGER(), nullable=False, default=0, server_default="0"),
+    )
+    stars_2: int = Field(
+        default=0,
+        sa_column=Column(pg.INTEGER(), nullable=False, default=0, server_default="0"),
+    )
+    stars_3: int = Field(
+        default=0,
+        sa_column=Column(pg.INTEGER(), nullable=False, default=0, server_default="0"),
+    )
+    stars_4: int = Field(
+        default=0,
+        sa_column=Column(pg.INTEGER(), nullable=False, default=0, server_default="0"),
+    )
+    stars_5: int = Field(
+        default=0,
+        sa_column=Column(pg.INTEGER(), nullable=False, default=0, server_default="0"),
+    )
+
+    def __repr__(self):
+        return f"<BookRatingHistogram {self.book_uid}>"
@@ -0,0 +1,94 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import tuple_
+from src.errors import InvalidCursor
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# relevance-ranked results have no stable keyset, so they page by offset;
+# this caps how deep a client can page before it should refine the query
+MAX_SEARCH_OFFSET = 1000
+
+
+def encode_cursor(created_at: datetime, uid: UUID, sort_key: Any = None) -> str:
+    """Encode the (created_at, uid) position of a row into an opaque cursor.
+
+    Pages ordered by another column first (e.g. rating) also carry that
+    column's value as `sort_key`.
+    """
+    payload = {"c": created_at.isoformat(), "u": str(uid)}
+    if sort_key is not None:
+        payload["k"] = sort_key
+    payload = json.dumps(payload)
+
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(
+    cursor: str,
+    with_sort_key: bool = False,
+    sort_key_valid: Optional[Callable[[Any], bool]] = None,
+) -> tuple:
+    """Decode a cursor produced by `encode_cursor`.
+
+    Cursors come back from clients, so a sort key is only returned once
+    `sort_key_valid` accepts it; anything else is an `InvalidCursor`, not a
+    type error from the database.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        position = datetime.fromisoformat(payload["c"]), UUID(payload["u"])
+        if not with_sort_key:
+            return position
+        sort_key = payload["k"]
+    except Exception:
+        raise InvalidCursor()
+
+    if sort_key_valid is not None and not sort_key_valid(sort_key):
+        raise InvalidCursor()
+    return (sort_key, *position)
+
+
+def keyset_after(
+    statement,
+    created_at_column,
+    uid_column,
+    cursor: Optional[str],
+    sort_column=None,
+    sort_key_valid: Optional[Callable[[Any], bool]] = None,
+):
+    """Restrict a descending statement to rows strictly after the cursor"""
+    if cursor is None:
+        return statement
+
+    if sort_column is None:
+        created_at, uid = decode_cursor(cursor)
+        return statement.where(
+            tuple_(created_at_column, uid_column) < tuple_(created_at, uid)
+        )
+
+    sort_key, created_at, uid = decode_cursor(
+        cursor, with_sort_key=True, sort_key_valid=sort_key_valid
+    )
+    return statement.where(
+        tuple_(sort_column, created_at_column, uid_column)
+        < tuple_(sort_key, created_at, uid)
+    )
+
+
+def build_page(rows: Sequence[Any], limit: int, sort_attr: Optional[str] = None) -> dict:
+    """Turn `limit + 1` fetched rows into a page with its `next_cursor`"""
+    items = list(rows[:limit])
+    next_cursor = None
+
+    if len(rows) > limit:
+        last = items[-1]
+        sort_key = getattr(last, sort_attr) if sort_attr else None
+        next_cursor = encode_cursor(last.created_at, last.uid, sort_key)
+
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,114 @@
+import os
+import time
+import uuid
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.metrics import (
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_CHECKOUT_SECONDS,
+    DB_POOL_CONNECTIONS,
+    DB_POOL_TIMEOUTS,
+)
+
+
+class PoolStats:
+    """Checkout counters for this worker's connection pool"""
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_checkout(self, waited: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+# per pool, by InstrumentedPool.name
+pool_stats = {"primary": PoolStats(), "replica": PoolStats()}
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that times how long each checkout waits.
+
+    `name` keys the pool's stats and labels its metrics. It is a class
+    attribute, so it survives the pool being recreated on engine.dispose().
+    """
+
+    name = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats[self.name].timeouts += 1
+            DB_POOL_TIMEOUTS.labels(self.name).inc()
+            raise
+
+        waited = time.perf_counter() - start
+        pool_stats[self.name].record_checkout(waited)
+        DB_POOL_CHECKOUT_SECONDS.labels(self.name).observe(waited)
+        return connection
+
+
+class ReplicaPool(InstrumentedPool):
+    name = "replica"
+
+
+def track_pool_metrics(pool) -> None:
+    """Move the pool gauges with pool events, so every worker's figures are
+    current at scrape time without /metrics visiting each worker's pool"""
+    connections = DB_POOL_CONNECTIONS.labels(pool.name)
+    checked_out = DB_POOL_CHECKED_OUT.labels(pool.name)
+    event.listen(pool, "connect", lambda *args: connections.inc())
+    event.listen(pool, "close", lambda *args: connections.dec())
+    event.listen(pool, "checkout", lambda *args: checked_out.inc())
+    event.listen(pool, "checkin", lambda *args: checked_out.dec())
+
+
+def engine_options(config, poolclass=InstrumentedPool) -> dict:
+    """create_async_engine keyword arguments built from the DB_* settings"""
+    options = {
+        "poolclass": poolclass,
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+    connect_args = {"prepared_statement_cache_size": config.DB_STATEMENT_CACHE_SIZE}
+
+    if config.DB_PGBOUNCER:
+        # PgBouncer in transaction mode hands each transaction to any server
+        # connection, so named prepared statements cannot be reused or cached
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+
+    options["connect_args"] = connect_args
+    return options
+
+
+def pool_status(pool) -> dict:
+    """Live figures for this worker's pool, for GET /admin/pool"""
+    stats = pool_stats[pool.name]
+    return {
+        "pid": os.getpid(),
+        "pool": pool.name,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "checkouts": stats.checkouts,
+        "timeouts": stats.timeouts,
+        "wait_seconds_total": round(stats.wait_seconds_total, 6),
+        "wait_seconds_max": round(stats.wait_seconds_max, 6),
+    }
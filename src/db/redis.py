@@ -1,17 +1,339 @@
 import redis.asyncio as redis
 from src.config import Config
+from src.metrics import REDIS_COMMAND_SECONDS
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import asyncio
+import json
+import logging
+import time
 
 JTI_EXPIRY_TIME = 3600
+# revoked JTIs: a sorted set scored by expiry to seed new workers, and a
+# channel that tells running workers about each new revocation
+REVOKED_JTIS_KEY = "auth:revoked_jtis"
+REVOKED_JTI_CHANNEL = "auth:revoked"
+REVOCATION_RETRY_DELAY = 1
+SUGGEST_CACHE_TTL = 30
+PRINCIPAL_CACHE_TTL = 60
+BOOK_DETAIL_CACHE_TTL = 300
 
-token_block_list = redis.from_url(Config.REDIS_URL)
+# leaderboards, both over the last week in daily buckets: new reviews per
+# book (trending weighs recent days more; top rated uses them as the review
+# count) and the sum of those reviews' ratings (for top rated's average)
+TOP_RATED_MIN_REVIEWS = 3
+TRENDING_DAYS = 7
+TRENDING_DECAY = 0.7
+TRENDING_CACHE_TTL = 60
+
+
+class InstrumentedPipeline(redis.client.Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_SECONDS.labels("PIPELINE").observe(time.perf_counter() - start)
+
+
+class InstrumentedRedis(redis.Redis):
+    """redis.asyncio client that times each round trip for /metrics"""
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_SECONDS.labels(str(args[0]).upper()).observe(
+                time.perf_counter() - start
+            )
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None):
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+token_block_list = InstrumentedRedis.from_url(Config.REDIS_URL)
 # Redis(host=Config.REDIS_HOST, port=Config.REDIS_PORT, db=0
 # )
 
 
+class RevokedTokens:
+    """This worker's copy of the JTI blocklist, kept fresh over redis pub/sub.
+
+    While subscribed (`live`), blocklist checks are a set lookup with no
+    network round trip. The subscription is made before the set is seeded
+    from REVOKED_JTIS_KEY, so no revocation falls in between; whenever the
+    subscription drops, callers fall back to asking redis directly.
+    """
+
+    def __init__(self) -> None:
+        self.live = False
+        self._jtis: dict[str, float] = {}
+        self._pruned_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, jti: str, expires_at: float) -> None:
+        self._jtis[jti] = expires_at
+
+        now = time.time()
+        if now - self._pruned_at > 60:
+            self._pruned_at = now
+            self._jtis = {j: e for j, e in self._jtis.items() if e > now}
+
+    def __contains__(self, jti: str) -> bool:
+        expires_at = self._jtis.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = token_block_list.pubsub()
+            try:
+                await pubsub.subscribe(REVOKED_JTI_CHANNEL)
+                revoked = await token_block_list.zrangebyscore(
+                    REVOKED_JTIS_KEY, time.time(), "+inf", withscores=True
+                )
+                for jti, expires_at in revoked:
+                    self.add(jti.decode(), expires_at)
+                self.live = True
+
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.add(message["data"].decode(), time.time() + JTI_EXPIRY_TIME)
+            except redis.RedisError as e:
+                logging.warning("revoked token subscription failed: %s", e)
+            finally:
+                self.live = False
+                await pubsub.aclose()
+
+            await asyncio.sleep(REVOCATION_RETRY_DELAY)
+
+
+revoked_tokens = RevokedTokens()
+
+
 async def add_jti_to_blocklist(jti: str) -> None:
-    await token_block_list.set(name=jti, value="", ex=JTI_EXPIRY_TIME)
+    expires_at = time.time() + JTI_EXPIRY_TIME
+    async with token_block_list.pipeline(transaction=True) as pipe:
+        pipe.set(name=jti, value="", ex=JTI_EXPIRY_TIME)
+        pipe.zadd(REVOKED_JTIS_KEY, {jti: expires_at})
+        pipe.zremrangebyscore(REVOKED_JTIS_KEY, "-inf", time.time())
+        pipe.publish(REVOKED_JTI_CHANNEL, jti)
+        await pipe.execute()
+
+    revoked_tokens.add(jti, expires_at)
 
 
 async def token_in_blocklist(jti: str) -> bool:
+    revoked_tokens.start()
+    if revoked_tokens.live:
+        return jti in revoked_tokens
+
     jti = await token_block_list.get(jti)
     return jti is not None
+
+
+async def cache_get(key: str) -> Optional[bytes]:
+    """Best-effort cache read: a miss or an unreachable redis both return None"""
+    try:
+        return await token_block_list.get(key)
+    except redis.RedisError as e:
+        logging.warning("cache read of %s failed: %s", key, e)
+        return None
+
+
+async def cache_set(key: str, value: bytes | str, ex: int) -> None:
+    try:
+        await token_block_list.set(name=key, value=value, ex=ex)
+    except redis.RedisError as e:
+        logging.warning("cache write of %s failed: %s", key, e)
+
+
+async def cache_delete(key: str) -> None:
+    try:
+        await token_block_list.delete(key)
+    except redis.RedisError as e:
+        logging.warning("cache delete of %s failed: %s", key, e)
+
+
+async def get_cached_suggestions(key: str) -> Optional[list[str]]:
+    cached = await cache_get(key)
+    return json.loads(cached) if cached is not None else None
+
+
+async def cache_suggestions(key: str, suggestions: list[str]) -> None:
+    await cache_set(key, json.dumps(suggestions), ex=SUGGEST_CACHE_TTL)
+
+
+def book_detail_key(book_uid) -> str:
+    return f"book:detail:{book_uid}"
+
+
+def principal_key(user_uid) -> str:
+    return f"auth:principal:{user_uid}"
+
+
+def trending_bucket_key(day) -> str:
+    return f"leaderboard:reviews:{day.isoformat()}"
+
+
+def rating_sum_bucket_key(day) -> str:
+    return f"leaderboard:rating_sum:{day.isoformat()}"
+
+
+def today_utc():
+    return datetime.now(timezone.utc).date()
+
+
+def utc_day(value: datetime):
+    # timestamptz columns come back aware; a naive value is taken as UTC,
+    # not as the server's local time
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).date()
+
+
+async def record_review_in_leaderboards(
+    book_uid, rating: int, previous_rating: Optional[int], created_at: datetime
+) -> None:
+    """Push a review write into the weekly buckets; best effort, like the caches.
+
+    A new review counts in today's buckets. A changed rating moves the sum
+    of the day the review was first written, while that day is still in
+    the window; the review is already counted there.
+    """
+    member = str(book_uid)
+    bucket_ttl = timedelta(days=TRENDING_DAYS + 1)
+    try:
+        async with token_block_list.pipeline(transaction=False) as pipe:
+            if previous_rating is None:
+                day = today_utc()
+                pipe.zincrby(trending_bucket_key(day), 1, member)
+                pipe.zincrby(rating_sum_bucket_key(day), rating, member)
+                pipe.expire(trending_bucket_key(day), bucket_ttl)
+                pipe.expire(rating_sum_bucket_key(day), bucket_ttl)
+            else:
+                day = utc_day(created_at)
+                if rating != previous_rating and (today_utc() - day).days < TRENDING_DAYS:
+                    # XX: only if the review's own day still holds it
+                    pipe.zadd(
+                        rating_sum_bucket_key(day),
+                        {member: rating - previous_rating},
+                        xx=True,
+                        incr=True,
+                    )
+
+            await pipe.execute()
+    except redis.RedisError as e:
+        logging.warning("leaderboard update for %s failed: %s", member, e)
+
+
+async def remove_book_from_leaderboards(book_uid) -> None:
+    member = str(book_uid)
+    today = today_utc()
+    try:
+        async with token_block_list.pipeline(transaction=False) as pipe:
+            for age in range(TRENDING_DAYS):
+                day = today - timedelta(days=age)
+                pipe.zrem(trending_bucket_key(day), member)
+                pipe.zrem(rating_sum_bucket_key(day), member)
+            # and from today's derived rankings, which live for a minute
+            pipe.zrem(f"leaderboard:top_rated:{today.isoformat()}", member)
+            pipe.zrem(f"leaderboard:trending:{today.isoformat()}", member)
+            await pipe.execute()
+    except redis.RedisError as e:
+        logging.warning("leaderboard removal of %s failed: %s", member, e)
+
+
+async def top_rated_book_uids(limit: int) -> list[str]:
+    """Highest average rating among the reviews written this week.
+
+    Like trending, the ranking is derived from the daily buckets at most
+    once a minute per day and stored; reads are a plain ZREVRANGE. Redis
+    cannot divide one sorted set by another, so the averages are computed
+    here from the summed buckets.
+    """
+    today = today_utc()
+    key = f"leaderboard:top_rated:{today.isoformat()}"
+    days = [today - timedelta(days=age) for age in range(TRENDING_DAYS)]
+    counts_key, sums_key = f"{key}:counts", f"{key}:sums"
+    try:
+        if not await token_block_list.exists(key):
+            async with token_block_list.pipeline(transaction=True) as pipe:
+                pipe.zunionstore(counts_key, [trending_bucket_key(day) for day in days])
+                pipe.zunionstore(sums_key, [rating_sum_bucket_key(day) for day in days])
+                pipe.zrangebyscore(
+                    counts_key, TOP_RATED_MIN_REVIEWS, "+inf", withscores=True
+                )
+                pipe.zrange(sums_key, 0, -1, withscores=True)
+                pipe.delete(counts_key, sums_key)
+                *_, counts, sums, _ = await pipe.execute()
+
+            sums = dict(sums)
+            averages = {member: sums.get(member, 0) / count for member, count in counts}
+            async with token_block_list.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                if averages:
+                    pipe.zadd(key, averages)
+                pipe.expire(key, TRENDING_CACHE_TTL)
+                await pipe.execute()
+        members = await token_block_list.zrevrange(key, 0, limit - 1)
+    except redis.RedisError as e:
+        logging.warning("top rated leaderboard read failed: %s", e)
+        return []
+
+    return [member.decode() for member in members]
+
+
+async def trending_book_uids(limit: int) -> list[str]:
+    """Most reviewed books over the last week, recent days weighing more.
+
+    The weighted union of the daily buckets is stored for a minute, so the
+    O(N) ZUNIONSTORE runs at most once a minute per worker and reads are a
+    plain O(log n + limit) ZREVRANGE.
+    """
+    today = today_utc()
+    key = f"leaderboard:trending:{today.isoformat()}"
+    try:
+        if not await token_block_list.exists(key):
+            weights = {
+                trending_bucket_key(today - timedelta(days=age)): TRENDING_DECAY**age
+                for age in range(TRENDING_DAYS)
+            }
+            async with token_block_list.pipeline(transaction=True) as pipe:
+                pipe.zunionstore(key, weights)
+                pipe.expire(key, TRENDING_CACHE_TTL)
+                await pipe.execute()
+        members = await token_block_list.zrevrange(key, 0, limit - 1)
+    except redis.RedisError as e:
+        logging.warning("trending leaderboard read failed: %s", e)
+        return []
+
+    return [member.decode() for member in members]
+
+
+async def load_leaderboards(buckets: list) -> None:
+    """Replace the week's buckets wholesale from (day, book_uid, reviews,
+    rating_sum) rows, e.g. after a backfill"""
+    today = today_utc()
+    bucket_ttl = timedelta(days=TRENDING_DAYS + 1)
+    async with token_block_list.pipeline(transaction=True) as pipe:
+        for age in range(TRENDING_DAYS):
+            day = today - timedelta(days=age)
+            pipe.delete(
+                trending_bucket_key(day),
+                rating_sum_bucket_key(day),
+                f"leaderboard:top_rated:{day.isoformat()}",
+                f"leaderboard:trending:{day.isoformat()}",
+            )
+        for day, book_uid, reviews, rating_sum in buckets:
+            pipe.zadd(trending_bucket_key(day), {str(book_uid): reviews})
+            pipe.zadd(rating_sum_bucket_key(day), {str(book_uid): rating_sum})
+            pipe.expire(trending_bucket_key(day), bucket_ttl)
+            pipe.expire(rating_sum_bucket_key(day), bucket_ttl)
+        await pipe.execute()
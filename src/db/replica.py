@@ -0,0 +1,33 @@
+from contextvars import ContextVar
+from typing import Optional
+
+# set on responses to requests that wrote, so the client's next few reads
+# also go to the primary instead of a replica that may lag behind
+READ_YOUR_WRITES_COOKIE = "bookly_primary"
+
+
+class RequestRouting:
+    """Where this request's reads may go; shared by reference across tasks"""
+
+    __slots__ = ("pinned", "wrote")
+
+    def __init__(self, pinned: bool = False) -> None:
+        self.pinned = pinned
+        self.wrote = False
+
+
+request_routing: ContextVar[Optional[RequestRouting]] = ContextVar(
+    "request_routing", default=None
+)
+
+
+def pin_primary() -> None:
+    """Send the rest of this request's reads, and the client's next ones, to the primary"""
+    routing = request_routing.get()
+    if routing is not None:
+        routing.wrote = True
+
+
+def reads_from_primary() -> bool:
+    routing = request_routing.get()
+    return routing is not None and (routing.pinned or routing.wrote)
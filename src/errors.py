@@ -76,6 +76,18 @@ class UserNotFound(BooklyException):
     pass
 
 
+class InvalidCursor(BooklyException):
+    """User has provided a malformed or tampered pagination cursor"""
+
+    pass
+
+
+class PasswordHashingBusy(BooklyException):
+    """Too many password hashes are already queued; the client should retry"""
+
+    pass
+
+
 class AccountNotVerified(Exception):
     """Account not yet verified"""
 
@@ -145,6 +157,26 @@ def register_all_errors(app: FastAPI):
             },
         ),
     )
+    app.add_exception_handler(
+        InvalidCursor,
+        create_exception_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            initial_detail={
+                "message": "Invalid pagination cursor",
+                "error_code": "invalid_cursor",
+            },
+        ),
+    )
+    app.add_exception_handler(
+        PasswordHashingBusy,
+        create_exception_handler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            initial_detail={
+                "message": "Too many logins in progress, please retry shortly",
+                "error_code": "password_hashing_busy",
+            },
+        ),
+    )
     app.add_exception_handler(
         UserNotFound,
         create_exception_handler(
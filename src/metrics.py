@@ -0,0 +1,159 @@
+"""Prometheus metrics, served at GET /metrics.
+
+Under several worker processes set PROMETHEUS_MULTIPROC_DIR to an empty
+directory before start up; each worker then writes its samples to its own
+mmap'd files and a scrape merges them, so any worker can answer /metrics.
+Live gauges of exited workers are dropped by `mark_worker_dead`.
+"""
+
+import atexit
+import os
+import threading
+import time
+
+from celery.signals import after_task_publish, before_task_publish
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# fast calls: redis round trips, pool checkouts, broker publishes
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Requests answered", ["method", "route", "status"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to answer a request", ["method", "route"]
+)
+HTTP_RESPONSE_BYTES = Histogram(
+    "http_response_size_bytes",
+    "Response body size, when known up front",
+    ["method", "route"],
+    buckets=SIZE_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests being served", multiprocess_mode="livesum"
+)
+
+# labelled by pool: "primary", or "replica" when DATABASE_READ_URL is set
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Open pooled connections",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Pooled connections in use",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    ["pool"],
+    buckets=FAST_BUCKETS,
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT", ["pool"]
+)
+
+REDIS_COMMAND_SECONDS = Histogram(
+    "redis_command_duration_seconds",
+    "Redis round trip time; pipelines count as one command",
+    ["command"],
+    buckets=FAST_BUCKETS,
+)
+
+CELERY_ENQUEUE_SECONDS = Histogram(
+    "celery_enqueue_duration_seconds",
+    "Time to publish a task to the broker",
+    ["task"],
+    buckets=FAST_BUCKETS,
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+# both publish signals fire on the publishing thread, within one call; a
+# publish that raises leaves a stale start behind, which the next overwrites
+_publish = threading.local()
+
+
+@before_task_publish.connect
+def _task_publish_started(sender=None, **kwargs):
+    _publish.started = time.perf_counter()
+
+
+@after_task_publish.connect
+def _task_published(sender=None, **kwargs):
+    started = getattr(_publish, "started", None)
+    _publish.started = None
+    if started is not None:
+        CELERY_ENQUEUE_SECONDS.labels(sender).observe(time.perf_counter() - started)
+
+
+def mark_worker_dead(pid: int) -> None:
+    """Drop a finished worker's live gauge files (in flight, pool) so a scrape
+    stops summing them; its counters and histograms are kept"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
+
+
+# a worker that exits cleanly cleans up after itself; gunicorn.conf.py also
+# covers workers that were killed
+atexit.register(lambda: mark_worker_dead(os.getpid()))
+
+
+def route_template(scope: dict) -> str:
+    """The matched path template, so /books/{book_uid} is one series, not one per book"""
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+# labelled children by (method, route, status); labels() validates and takes
+# a lock on every call, a dict hit does neither. Routes are templates, so
+# this stays as small as the route table.
+_request_series: dict[tuple, tuple] = {}
+
+
+def record_request(
+    method: str, route: str, status: int, seconds: float, size: int | None
+) -> None:
+    key = (method, route, status)
+    series = _request_series.get(key)
+    if series is None:
+        series = _request_series[key] = (
+            HTTP_REQUESTS.labels(method, route, str(status)),
+            HTTP_REQUEST_SECONDS.labels(method, route),
+            HTTP_RESPONSE_BYTES.labels(method, route),
+        )
+
+    requests, duration, response_bytes = series
+    requests.inc()
+    duration.observe(seconds)
+    if size is not None:
+        response_bytes.observe(size)
+
+
+def metrics_registry():
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+
+    # merge every worker's files; a fresh registry per scrape, as the
+    # client library requires in multiprocess mode
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+async def metrics_endpoint() -> Response:
+    return Response(generate_latest(metrics_registry()), media_type=CONTENT_TYPE_LATEST)
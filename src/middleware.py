@@ -1,29 +1,141 @@
-from fastapi import FastAPI, Request, status
+from fastapi import FastAPI, status
 import time
 import logging
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from src.access_log import access_logger, should_log, start_access_log
+from src.config import Config
+from src.db.instrumentation import (
+    QueryStats,
+    query_stats,
+    report_n_plus_one,
+    server_timing,
+)
+from src.db.main import read_engine
+from src.db.replica import READ_YOUR_WRITES_COOKIE, RequestRouting, request_routing
+from src.metrics import HTTP_IN_FLIGHT, record_request, route_template
 
 logger = logging.getLogger("uvicorn.access")
 logger.disabled = True
 
 
-def register_middleware(app: FastAPI):
-    @app.middleware("http")
-    async def custom_logging_middleware(request: Request, call_next):
+class AccessLogMiddleware:
+    """Times each request, counts its queries and logs it, as plain ASGI.
+
+    Unlike @app.middleware("http"), nothing here wraps the response in an
+    extra task or stream; it only watches the messages going out.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
         start_time = time.perf_counter()
+        stats = QueryStats(track_statements=Config.SQL_DETECT_N_PLUS_ONE)
+        token = query_stats.set(stats)
+        status_code = 500
+        size = None
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                length = headers.get("content-length")
+                size = int(length) if length is not None else None
+                headers.append(
+                    "Server-Timing",
+                    server_timing(stats, time.perf_counter() - start_time),
+                )
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            query_stats.reset(token)
+            HTTP_IN_FLIGHT.dec()
+            End_Time = time.perf_counter() - start_time
+            route = route_template(scope)
+            record_request(scope["method"], route, status_code, End_Time, size)
+            self.log(scope, route, status_code, End_Time, stats)
+
+    def log(
+        self, scope: Scope, route: str, status_code: int, seconds: float, stats: QueryStats
+    ) -> None:
+        repeated = {}
+        if Config.SQL_DETECT_N_PLUS_ONE:
+            repeated = report_n_plus_one(
+                stats, Config.SQL_N_PLUS_ONE_THRESHOLD, scope["path"]
+            )
+        if not (repeated or should_log(status_code, Config.ACCESS_LOG_SAMPLE_RATE)):
+            return
 
-        response = await call_next(request)
+        client = scope.get("client")
+        record = {
+            "client": f"{client[0]}:{client[1]}" if client else None,
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route,
+            "status": status_code,
+            "duration_ms": round(seconds * 1000, 3),
+            "db_queries": stats.count,
+            "db_ms": round(stats.seconds * 1000, 3),
+            "sample_rate": Config.ACCESS_LOG_SAMPLE_RATE,
+        }
+        if repeated:
+            record["n_plus_one"] = list(repeated.values())
 
-        End_Time = time.perf_counter() - start_time
+        access_logger.info(record)
 
-        message = f"{request.client.host}:{request.client.port} - {request.method} - {request.url.path} - {response.status_code} - Completed after {End_Time:.6f} sec"
 
-        print(message)
+class ReadYourWritesMiddleware:
+    """A client that wrote moments ago reads from the primary until the
+    replica has had time to catch up"""
 
-        return response
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cookies = cookie_parser(Headers(scope=scope).get("cookie", ""))
+        routing = RequestRouting(pinned=READ_YOUR_WRITES_COOKIE in cookies)
+
+        async def send_with_pin(message: Message) -> None:
+            if (
+                message["type"] == "http.response.start"
+                and routing.wrote
+                and read_engine is not None
+            ):
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{READ_YOUR_WRITES_COOKIE}=1; HttpOnly; "
+                    f"Max-Age={Config.READ_YOUR_WRITES_SECONDS}; Path=/; SameSite=lax",
+                )
+            await send(message)
+
+        token = request_routing.set(routing)
+        try:
+            await self.app(scope, receive, send_with_pin)
+        finally:
+            request_routing.reset(token)
+
+
+def register_middleware(app: FastAPI):
+    start_access_log()
+    app.add_middleware(AccessLogMiddleware)
+    app.add_middleware(ReadYourWritesMiddleware)
 
     # @app.middleware("http")
     # async def authorization(request: Request, call_next):
@@ -41,8 +153,8 @@ def register_middleware(app: FastAPI):
     #             status_code=status.HTTP_401_UNAUTHORIZED,
     #         )
 
-        response = await call_next(request)
-        return response
+    #     response = await call_next(request)
+    #     return response
 
     app.add_middleware(
         CORSMiddleware,
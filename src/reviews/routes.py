@@ -1,35 +1,127 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from src.db.models import User
-from src.db.main import get_session
-from src.auth.dependencies import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from src.db.main import get_read_session, get_session
+from src.auth.dependencies import AccessTokenBearer, RoleChecker
+from src.db.export import export_response
 from sqlmodel.ext.asyncio.session import AsyncSession
-from .schemas import ReviewCreateModel, ReviewModel
-from .service import ReviewService
+from src.db.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from .schemas import (
+    ReviewCreateModel,
+    ReviewModel,
+    ReviewPageModel,
+    RatingHistogramModel,
+)
+from .service import ReviewService, REVIEW_EXPORT_COLUMNS
+from typing import Literal, Optional
 from uuid import UUID
 
 review_service = ReviewService()
 review_router = APIRouter()
+access_token_bearer = AccessTokenBearer()
+admin_checker = Depends(RoleChecker(["admin"]))
+role_checker = Depends(RoleChecker(["admin", "user"]))
+
+
+@review_router.get(
+    "/export",
+    dependencies=[admin_checker],
+    responses={
+        200: {"description": "Every review, streamed as NDJSON or CSV"},
+        401: {"description": "Not authenticated"},
+        403: {"description": "Insufficient permissions"},
+    },
+)
+async def export_reviews(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    compress: bool = False,
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Stream the whole reviews table without loading it into memory"""
+    return export_response(
+        review_service.stream_reviews(session),
+        REVIEW_EXPORT_COLUMNS,
+        "reviews",
+        format,
+        compress,
+    )
+
+
+@review_router.get(
+    "/book/{book_uid}",
+    response_model=ReviewPageModel,
+    dependencies=[role_checker],
+    responses={
+        200: {"description": "One page of the book's reviews"},
+        400: {"description": "Invalid cursor"},
+        401: {"description": "Not authenticated"},
+        403: {"description": "Insufficient permissions"},
+        404: {"description": "Book not found"},
+        422: {"description": "Validation error"},
+    },
+)
+async def get_book_reviews(
+    book_uid: UUID,
+    sort: Literal["newest", "rating"] = "newest",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Page through a book's reviews; pass `next_cursor` back as `cursor`"""
+    page = await review_service.get_book_reviews(
+        book_uid, session, sort=sort, limit=limit, cursor=cursor
+    )
+    if page is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
+        )
+
+    return page
+
+
+@review_router.get(
+    "/book/{book_uid}/histogram",
+    response_model=RatingHistogramModel,
+    dependencies=[role_checker],
+    responses={
+        200: {"description": "Number of reviews at each star rating"},
+        401: {"description": "Not authenticated"},
+        403: {"description": "Insufficient permissions"},
+        404: {"description": "Book not found"},
+    },
+)
+async def get_rating_histogram(
+    book_uid: UUID,
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Five-bar rating distribution, read from the maintained summary table"""
+    histogram = await review_service.get_rating_histogram(book_uid, session)
+    if histogram is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
+        )
+
+    return histogram
 
 
 @review_router.post(
     "/{book_uid}",
+    response_model=ReviewModel,
     responses={
         200: {"description": "Review added successfully"},
         401: {"description": "Not authenticated"},
         403: {"description": "Insufficient permissions"},
-        404: {"description": "Book not found"},
+        404: {"description": "Book or user not found"},
         422: {"description": "Validation error"},
-        500: {"description": "Internal server error"},
     },
 )
 async def add_review_to_books(
     book_uid: UUID,
     review_data: ReviewCreateModel,
-    current_user: User = Depends(get_current_user),
+    token_details: dict = Depends(access_token_bearer),
     session: AsyncSession = Depends(get_session),
 ):
+    """Add a review, or replace the caller's earlier review of the same book"""
     new_review = await review_service.add_review_to_book(
-        user_email=current_user.email,
+        user_uid=UUID(token_details["user"]["user_uid"]),
         review_data=review_data,
         book_uid=book_uid,
         session=session,
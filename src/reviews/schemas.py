@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 import uuid
 
 
@@ -17,3 +17,18 @@ class ReviewModel(BaseModel):
 class ReviewCreateModel(BaseModel):
     ratings: int = Field(ge=1,le=5)
     review_text: str
+
+
+class ReviewPageModel(BaseModel):
+    items: List[ReviewModel]
+    next_cursor: Optional[str] = None
+
+
+class RatingHistogramModel(BaseModel):
+    book_uid: uuid.UUID
+    stars_1: int
+    stars_2: int
+    stars_3: int
+    stars_4: int
+    stars_5: int
+    total: int
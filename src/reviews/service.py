@@ -1,69 +1,245 @@
-from src.db.models import Review
-from src.auth.service import UserService
-from src.books.service import BookService
+from src.db.models import Review, BookModel, BookRatingHistogram
+from src.books.service import BookService, rating_delta_values
+from src.db.export import EXPORT_BATCH_SIZE
+from src.db.pagination import DEFAULT_PAGE_SIZE, keyset_after, build_page
+from src.db.redis import record_review_in_leaderboards
 from sqlmodel.ext.asyncio.session import AsyncSession
-from fastapi import HTTPException, status
+from src.errors import BookNotFound, UserNotFound
 from .schemas import ReviewCreateModel
 from sqlmodel import select, desc
+from sqlalchemy import case, delete, func, update
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert
 from uuid import UUID
+from typing import Optional
 import datetime
-import logging
+import uuid
 
 book_service = BookService()
-user_service = UserService()
+
+REVIEW_EXPORT_COLUMNS = list(Review.model_fields)
+# one review per user and book; the conflict target for review upserts
+REVIEW_KEY = ["book_uid", "user_uid"]
+HISTOGRAM_COLUMNS = [f"stars_{stars}" for stars in range(1, 6)]
+
+
+def is_star_rating(value) -> bool:
+    # bool is an int subclass, but not a rating
+    return type(value) is int and 1 <= value <= 5
+
+
+def review_write_lock(book_uid: UUID, user_uid: UUID):
+    """pg_advisory_xact_lock on one user's review of one book, held until commit"""
+    return func.pg_advisory_xact_lock(
+        func.hashtextextended(f"review:{book_uid}:{user_uid}", 0)
+    )
 
 
 class ReviewService:
 
-    async def add_review_to_book(
+    async def get_book_reviews(
         self,
-        user_email: str,
         book_uid: UUID,
-        review_data: ReviewCreateModel,
         session: AsyncSession,
+        sort: str = "newest",
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
     ):
-        try:
-            book = await book_service.get_book(book_uid=book_uid, session=session)
-            if not book:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Book not found cannot add review",
-                )
-            user = await user_service.get_user_by_email(
-                email=user_email, session=session
+        """One page of a book's reviews, newest first or highest rated first.
+
+        Returns None when the book does not exist.
+        """
+        statement = select(Review).where(Review.book_uid == book_uid)
+        if sort == "rating":
+            statement = keyset_after(
+                statement,
+                Review.created_at,
+                Review.uid,
+                cursor,
+                Review.ratings,
+                sort_key_valid=is_star_rating,
             )
-            if not user:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="User not found cannot add review",
-                )
+            statement = statement.order_by(desc(Review.ratings))
+        else:
+            statement = keyset_after(statement, Review.created_at, Review.uid, cursor)
+        statement = statement.order_by(
+            desc(Review.created_at), desc(Review.uid)
+        ).limit(limit + 1)
+        result = await session.exec(statement)
+        rows = result.all()
+
+        # an empty first page is the only case where the book may be missing
+        if not rows and cursor is None:
+            if await book_service.get_book(book_uid, session) is None:
+                return None
+
+        return build_page(rows, limit, "ratings" if sort == "rating" else None)
+
+    async def stream_reviews(
+        self, session: AsyncSession, batch_size: int = EXPORT_BATCH_SIZE
+    ):
+        """Yield every review as batches of row mappings from a server-side cursor"""
+        statement = select(
+            *[getattr(Review, name) for name in REVIEW_EXPORT_COLUMNS]
+        ).execution_options(yield_per=batch_size)
+        result = await session.stream(statement)
+
+        async for rows in result.mappings().partitions():
+            yield rows
 
-            statement = select(Review).where(
-                Review.book_uid == book.uid, Review.user_uid == user.uid
+    async def get_rating_histogram(self, book_uid: UUID, session: AsyncSession):
+        """Review counts per star rating for a book; None when the book does not exist"""
+        statement = (
+            select(
+                BookModel.uid,
+                *[
+                    func.coalesce(getattr(BookRatingHistogram, name), 0).label(name)
+                    for name in HISTOGRAM_COLUMNS
+                ],
             )
+            .outerjoin(BookRatingHistogram, BookRatingHistogram.book_uid == BookModel.uid)
+            .where(BookModel.uid == book_uid)
+        )
+        result = await session.exec(statement)
+        row = result.first()
+        if row is None:
+            return None
 
-            result = await session.exec(statement)
-            existing_review = result.first()
-            if existing_review:
-                existing_review.ratings = review_data.ratings
-                existing_review.review_text = review_data.review_text
-                existing_review.update_at = datetime.datetime.now()
-                await session.commit()
+        counts = {name: row._mapping[name] for name in HISTOGRAM_COLUMNS}
+        return {"book_uid": book_uid, **counts, "total": sum(counts.values())}
+
+    async def rebuild_rating_histograms(self, session: AsyncSession) -> int:
+        """Recompute every histogram with one grouped query over reviews"""
+        totals = select(
+            Review.book_uid,
+            *[
+                func.count(Review.uid).filter(Review.ratings == stars)
+                for stars in range(1, 6)
+            ],
+        ).group_by(Review.book_uid)
+        statement = insert(BookRatingHistogram).from_select(
+            ["book_uid", *HISTOGRAM_COLUMNS], totals
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=["book_uid"],
+            set_={name: getattr(statement.excluded, name) for name in HISTOGRAM_COLUMNS},
+        )
+        stale = delete(BookRatingHistogram).where(
+            ~select(Review.uid)
+            .where(Review.book_uid == BookRatingHistogram.book_uid)
+            .exists()
+        )
+        await session.exec(stale)
+        result = await session.exec(statement)
+        await session.commit()
 
-                return existing_review
-            else:
-                review_data_dict = review_data.model_dump()
+        return result.rowcount
 
-                new_review = Review(user=user, books=book, **review_data_dict)
+    async def add_review_to_book(
+        self,
+        user_uid: UUID,
+        book_uid: UUID,
+        review_data: ReviewCreateModel,
+        session: AsyncSession,
+    ):
+        """Create or replace a user's review of a book in a single statement.
 
-                session.add(new_review)
-                await session.commit()
+        The review upsert, the book's rating aggregates and its rating
+        histogram are one WITH statement: `previous` reads the user's old
+        rating from the statement snapshot, so the aggregates and histogram
+        move by the delta. A missing book or user surfaces as a foreign key
+        violation.
 
-                return new_review
+        Writes for the same (book, user) are serialized first with a
+        transaction-scoped advisory lock. Otherwise two concurrent first
+        submissions would both read no previous rating, and the one that
+        lands on ON CONFLICT would count the review a second time.
+        """
+        now = datetime.datetime.now()
+        previous = (
+            select(Review.ratings)
+            .where(Review.book_uid == book_uid, Review.user_uid == user_uid)
+            .cte("previous")
+        )
+        previous_rating = select(previous.c.ratings).scalar_subquery()
 
-        except Exception as e:
-            logging.exception(e)
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Oops  ... something went wrong",
+        statement = insert(Review).values(
+            uid=uuid.uuid4(),
+            book_uid=book_uid,
+            user_uid=user_uid,
+            created_at=now,
+            update_at=now,
+            **review_data.model_dump(),
+        )
+        upsert = (
+            statement.on_conflict_do_update(
+                index_elements=REVIEW_KEY,
+                set_={
+                    "ratings": statement.excluded.ratings,
+                    "review_text": statement.excluded.review_text,
+                    "update_at": statement.excluded.update_at,
+                },
             )
+            .returning(*Review.__table__.c)
+            .cte("upsert")
+        )
+        aggregates = (
+            update(BookModel)
+            .where(BookModel.uid == upsert.c.book_uid)
+            .values(
+                **rating_delta_values(
+                    case((previous_rating.is_(None), 1), else_=0),
+                    upsert.c.ratings - func.coalesce(previous_rating, 0),
+                )
+            )
+            .returning(BookModel.rating_count, BookModel.rating_avg)
+            .cte("aggregates")
+        )
+        histogram = insert(BookRatingHistogram).from_select(
+            ["book_uid", *HISTOGRAM_COLUMNS],
+            select(
+                upsert.c.book_uid,
+                *[
+                    case((upsert.c.ratings == stars, 1), else_=0)
+                    - case((previous_rating == stars, 1), else_=0)
+                    for stars in range(1, 6)
+                ],
+            ),
+        )
+        histogram = histogram.on_conflict_do_update(
+            index_elements=["book_uid"],
+            set_={
+                name: getattr(BookRatingHistogram, name)
+                + getattr(histogram.excluded, name)
+                for name in HISTOGRAM_COLUMNS
+            },
+        ).cte("histogram")
+        statement = (
+            select(
+                upsert,
+                aggregates.c.rating_count,
+                aggregates.c.rating_avg,
+                previous_rating.label("previous_rating"),
+            )
+            .select_from(upsert.join(aggregates, sa.true()))
+            .add_cte(histogram)
+        )
+
+        try:
+            await session.exec(select(review_write_lock(book_uid, user_uid)))
+            result = await session.exec(statement)
+            row = result.mappings().one()
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            if "user_uid" in str(e.orig):
+                raise UserNotFound()
+            raise BookNotFound()
+
+        await book_service.invalidate_book_detail(book_uid)
+        await record_review_in_leaderboards(
+            book_uid, row["ratings"], row["previous_rating"], row["created_at"]
+        )
+
+        return {name: row[name] for name in REVIEW_EXPORT_COLUMNS}
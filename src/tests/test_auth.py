@@ -22,4 +22,143 @@ def test_user_creation(fake_session, fake_user_Service, test_client):
     assert fake_user_Service.user_exists_called_once()
     assert fake_user_Service.user_exists_called_once_with(signup_data['email'],fake_session)
     assert fake_user_Service.create_user_called_once()
-    assert fake_user_Service.create_user_called_once_with(user_data,fake_session)
\ No newline at end of file
+    assert fake_user_Service.create_user_called_once_with(user_data,fake_session)
+
+def test_password_hashing_runs_off_the_event_loop_with_a_bounded_queue():
+    import asyncio
+    import time
+    import pytest
+    from src.auth.utils import PasswordHasher
+    from src.errors import PasswordHashingBusy
+
+    hasher = PasswordHasher(workers=1, queue_limit=1)
+
+    async def burst():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        calls = [asyncio.create_task(hasher.run(time.sleep, 0.1)) for _ in range(3)]
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        ticking.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(burst())
+
+    assert [type(r) for r in results].count(PasswordHashingBusy) == 1
+    assert ticks >= 10  # the loop kept serving while two 0.1s hashes ran
+    assert hasher.in_flight == 0
+
+
+def test_password_hash_round_trip():
+    import asyncio
+    from src.auth.utils import generate_password_hash, verify_password
+
+    async def round_trip():
+        hashed = await generate_password_hash("testokie1")
+        return (
+            await verify_password("testokie1", hashed),
+            await verify_password("wrong", hashed),
+        )
+
+    assert asyncio.run(round_trip()) == (True, False)
+
+
+def test_verified_tokens_are_decoded_once(monkeypatch):
+    import asyncio
+    from unittest.mock import AsyncMock, Mock
+    from fastapi.security.http import HTTPAuthorizationCredentials
+    from src.auth import dependencies
+    from src.auth.utils import create_access_token, decode_token
+
+    token = create_access_token(user_data={"email": "a@b.c", "user_uid": "1"})
+    decode = Mock(side_effect=decode_token)
+    monkeypatch.setattr(dependencies, "decode_token", decode)
+    monkeypatch.setattr(
+        dependencies, "token_in_blocklist", AsyncMock(return_value=False)
+    )
+    monkeypatch.setattr(
+        "fastapi.security.HTTPBearer.__call__",
+        AsyncMock(return_value=HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)),
+    )
+    dependencies.verified_tokens.clear()
+    bearer = dependencies.AccessTokenBearer()
+
+    async def authenticate_twice():
+        return await bearer(Mock()), await bearer(Mock())
+
+    first, second = asyncio.run(authenticate_twice())
+
+    assert first == second and first["user"]["email"] == "a@b.c"
+    decode.assert_called_once_with(token)
+
+
+def test_revocations_reach_other_workers_over_pubsub(monkeypatch):
+    import asyncio
+    from unittest.mock import AsyncMock
+    from fakeredis import FakeAsyncRedis
+    from src.db import redis as blocklist
+
+    fake = FakeAsyncRedis()
+    monkeypatch.setattr(blocklist, "token_block_list", fake)
+    monkeypatch.setattr(blocklist, "revoked_tokens", blocklist.RevokedTokens())
+
+    async def scenario():
+        await blocklist.add_jti_to_blocklist("before-start")
+        assert not await blocklist.token_in_blocklist("unknown")  # starts listening
+        while not blocklist.revoked_tokens.live:
+            await asyncio.sleep(0.01)
+
+        # another worker logs a token out: publish without touching our copy
+        await fake.publish(blocklist.REVOKED_JTI_CHANNEL, "from-elsewhere")
+        for _ in range(100):
+            if "from-elsewhere" in blocklist.revoked_tokens:
+                break
+            await asyncio.sleep(0.01)
+
+        # answered from the local copy: no GET round trips from here on
+        monkeypatch.setattr(fake, "get", AsyncMock(side_effect=AssertionError))
+        revoked = [
+            await blocklist.token_in_blocklist(jti)
+            for jti in ("before-start", "from-elsewhere", "unknown")
+        ]
+        blocklist.revoked_tokens._task.cancel()
+        return revoked
+
+    assert asyncio.run(scenario()) == [True, True, False]
+
+
+def test_principal_is_read_through_and_invalidated(monkeypatch):
+    import asyncio
+    from unittest.mock import AsyncMock, Mock
+    from uuid import uuid4
+    from fakeredis import FakeAsyncRedis
+    from src.auth.service import UserService, principal_cache
+
+    monkeypatch.setattr("src.db.redis.token_block_list", FakeAsyncRedis())
+    principal_cache.clear()
+    user_uid = uuid4()
+    row = Mock(
+        _mapping={"uid": user_uid, "email": "a@b.c", "role": "user", "is_verified": True}
+    )
+    session = Mock(commit=AsyncMock())
+    session.exec = AsyncMock(return_value=Mock(first=Mock(return_value=row)))
+    service = UserService()
+
+    async def scenario():
+        first = await service.get_principal(user_uid, session)
+        principal_cache.clear()  # a fresh worker still hits redis
+        second = await service.get_principal(user_uid, session)
+        await service.update_user(Mock(uid=user_uid), {"role": "admin"}, session)
+        await service.get_principal(user_uid, session)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first == second and first.role == "user"
+    assert session.exec.await_count == 2
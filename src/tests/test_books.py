@@ -9,3 +9,422 @@ def test_get_all_books(test_client, fake_book_Service, fake_session):
 
     assert fake_book_Service.get_all_books_called_once()
     assert fake_book_Service.get_all_books_called_once_with(fake_session)
+
+
+def test_book_cursor_round_trip():
+    from datetime import datetime, timezone
+    from uuid import uuid4
+    from src.db.pagination import encode_cursor, decode_cursor
+
+    created_at = datetime(2025, 10, 16, 18, 59, 40, tzinfo=timezone.utc)
+    uid = uuid4()
+
+    assert decode_cursor(encode_cursor(created_at, uid)) == (created_at, uid)
+
+
+def test_book_cursor_rejects_garbage():
+    import pytest
+    from src.db.pagination import decode_cursor
+    from src.errors import InvalidCursor
+
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+
+def test_search_books_uses_search_vector():
+    import asyncio
+    from unittest.mock import AsyncMock, Mock
+    from sqlalchemy.dialects import postgresql
+    from src.books.service import BookService
+
+    session = Mock()
+    session.exec = AsyncMock(return_value=Mock(all=Mock(return_value=[])))
+
+    page = asyncio.run(BookService().search_books("dune herbert", session, limit=10))
+
+    statement = session.exec.call_args.args[0]
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "books.search_vector @@ websearch_to_tsquery" in sql
+    assert "ts_rank_cd" in sql
+    assert page == {"items": [], "next_offset": None}
+
+
+def test_book_writes_return_only_mapped_columns(monkeypatch):
+    import asyncio
+    from datetime import date
+    from unittest.mock import AsyncMock, Mock
+    from uuid import uuid4
+    from fakeredis import FakeAsyncRedis
+    from sqlalchemy.dialects import postgresql
+    from src.books.schemas import BookCreateModel, BookUpdateModel
+    from src.books.service import BookService
+
+    monkeypatch.setattr("src.db.redis.token_block_list", FakeAsyncRedis())
+    session = AsyncMock()
+    session.exec = AsyncMock(return_value=Mock())
+    fields = dict(
+        title="Dune", author="Frank Herbert", publisher="Chilton", page_count=412,
+        language="English",
+    )
+
+    async def write():
+        service = BookService()
+        await service.create_book(
+            BookCreateModel(**fields, published_date=date(1965, 8, 1)), uuid4(), session
+        )
+        await service.update_book(uuid4(), BookUpdateModel(**fields), session)
+
+    asyncio.run(write())
+
+    for call in session.exec.call_args_list:
+        sql = str(call.args[0].compile(dialect=postgresql.dialect()))
+        assert "RETURNING books.uid" in sql
+        assert "search_vector" not in sql
+
+
+def test_update_book_normalizes_like_create(monkeypatch):
+    import asyncio
+    from unittest.mock import AsyncMock, Mock
+    from uuid import uuid4
+    from fakeredis import FakeAsyncRedis
+    from sqlalchemy.dialects import postgresql
+    from src.books.schemas import BookUpdateModel
+    from src.books.service import BookService
+
+    monkeypatch.setattr("src.db.redis.token_block_list", FakeAsyncRedis())
+    session = AsyncMock()
+    session.exec = AsyncMock(return_value=Mock())
+    update_data = BookUpdateModel(
+        title=" Dune ", author="frank herbert", publisher="Chilton ", page_count=412,
+        language="English",
+    )
+
+    asyncio.run(BookService().update_book(uuid4(), update_data, session))
+
+    params = session.exec.call_args.args[0].compile(dialect=postgresql.dialect()).params
+    assert (params["title"], params["author"], params["publisher"]) == (
+        "DUNE", "FRANK HERBERT", "CHILTON"
+    )
+
+
+def test_suggest_serves_repeat_prefixes_from_cache(monkeypatch):
+    import asyncio
+    from unittest.mock import AsyncMock, Mock
+    from fakeredis import FakeAsyncRedis
+    from sqlalchemy.dialects import postgresql
+    from src.books.service import BookService
+
+    monkeypatch.setattr("src.db.redis.token_block_list", FakeAsyncRedis())
+    session = Mock()
+    session.exec = AsyncMock(return_value=Mock(all=Mock(return_value=["DUNE"])))
+
+    async def suggest_twice():
+        service = BookService()
+        first = await service.suggest("title", "du", session)
+        second = await service.suggest("title", "DU ", session)
+        return first, second
+
+    assert asyncio.run(suggest_twice()) == (["DUNE"], ["DUNE"])
+    session.exec.assert_awaited_once()
+
+    sql = str(session.exec.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "books.title LIKE" in sql
+    assert "books.title %% " in sql
+
+
+def test_import_books_reports_row_errors_and_duplicates():
+    import asyncio
+    from unittest.mock import Mock
+    from uuid import uuid4
+    from src.books.importer import iter_records
+    from src.books.service import BookService
+
+    csv_body = (
+        b"title,author,publisher,published_date,page_count,language\r\n"
+        b'"Dune,\nthe novel",Frank Herbert,Chilton,1965-08-01,412,English\r\n'
+        b"Emma,Jane Austen,Murray,1815-12-23,not-a-number,English\r\n"
+        b"Dune again,Frank Herbert,Chilton,1965-08-01,412\r\n"
+        b"Persuasion,Jane Austen,Murray,1817-12-20,272,English"
+    )
+
+    async def body():
+        for i in range(0, len(csv_body), 7):
+            yield csv_body[i : i + 7]
+
+    chunks = []
+
+    async def bulk_insert_books(rows, session):
+        chunks.append([row["title"] for row in rows])
+        return 1
+
+    service = BookService()
+    service.bulk_insert_books = bulk_insert_books
+
+    report = asyncio.run(
+        service.import_books(iter_records(body(), "csv"), uuid4(), Mock(), chunk_size=2)
+    )
+
+    assert report["received"] == 4
+    assert report["inserted"] == 1
+    assert report["duplicates"] == 1
+    assert report["invalid"] == 2
+    assert [e["row"] for e in report["errors"]] == [2, 3]
+    assert chunks == [["DUNE,\nTHE NOVEL", "PERSUASION"]]
+
+
+def test_import_books_keeps_going_after_a_rejected_chunk():
+    import asyncio
+    from unittest.mock import AsyncMock
+    from uuid import uuid4
+    from sqlalchemy.exc import DBAPIError
+    from src.books.service import BookService
+
+    def record(title):
+        return {
+            "title": title,
+            "author": "Frank Herbert",
+            "publisher": "Chilton",
+            "published_date": "1965-08-01",
+            "page_count": 412,
+            "language": "English",
+        }
+
+    async def records():
+        for row_number, title in enumerate(["Dune", "x" * 151, "Emma", "Persuasion"], 1):
+            yield row_number, record(title)
+
+    async def bulk_insert_books(rows, session):
+        if rows[0]["title"] == "DUNE":
+            raise DBAPIError("INSERT", {}, Exception("deadlock detected"))
+        return len(rows)
+
+    session = AsyncMock()
+    service = BookService()
+    service.bulk_insert_books = bulk_insert_books
+
+    report = asyncio.run(
+        service.import_books(records(), uuid4(), session, chunk_size=2)
+    )
+
+    session.rollback.assert_awaited_once()
+    assert report["received"] == 4
+    assert report["inserted"] == 1
+    assert report["invalid"] == 3
+    assert [e["row"] for e in report["errors"]] == [2, 1, 3]
+    assert "deadlock detected" in report["errors"][1]["errors"][0]["msg"]
+
+
+def test_export_response_streams_gzipped_ndjson():
+    import asyncio
+    import gzip
+    import json
+    from src.db.export import export_response
+
+    async def partitions():
+        yield [{"uid": 1, "title": "DUNE"}, {"uid": 2, "title": "EMMA"}]
+        yield [{"uid": 3, "title": "PERSUASION"}]
+
+    response = export_response(
+        partitions(), ["uid", "title"], "books", "ndjson", compress=True
+    )
+
+    async def read_body():
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    lines = gzip.decompress(asyncio.run(read_body())).decode().splitlines()
+    assert response.headers["content-encoding"] == "gzip"
+    assert [json.loads(line)["title"] for line in lines] == ["DUNE", "EMMA", "PERSUASION"]
+
+
+def test_book_detail_is_cached_until_invalidated(monkeypatch):
+    import asyncio
+    from datetime import date, datetime
+    from unittest.mock import AsyncMock, Mock
+    from uuid import uuid4
+    from fakeredis import FakeAsyncRedis
+    from src.books.service import BookService, book_detail_cache
+    from src.db.models import BookModel
+
+    monkeypatch.setattr("src.db.redis.token_block_list", FakeAsyncRedis())
+    book_detail_cache.clear()
+    book_uid = uuid4()
+    book = BookModel(
+        uid=book_uid,
+        title="DUNE",
+        author="FRANK HERBERT",
+        publisher="CHILTON",
+        published_date=date(1965, 8, 1),
+        page_count=412,
+        language="English",
+        rating_count=0,
+        rating_sum=0,
+        rating_avg=0.0,
+        created_at=datetime(2025, 10, 16),
+        update_at=datetime(2025, 10, 16),
+        user_uid=uuid4(),
+        reviews=[],
+    )
+    service = BookService()
+    service.get_book = AsyncMock(return_value=book)
+
+    async def read_invalidate_read():
+        first = await service.get_book_detail(book_uid, Mock())
+        book_detail_cache.clear()  # a fresh worker still hits redis
+        second = await service.get_book_detail(book_uid, Mock())
+        await service.invalidate_book_detail(book_uid)
+        third = await service.get_book_detail(book_uid, Mock())
+        return first, second, third
+
+    first, second, third = asyncio.run(read_invalidate_read())
+
+    assert first == second == third
+    etag, last_modified, payload = first
+    assert etag.startswith('W/"')
+    assert last_modified == "Thu, 16 Oct 2025 00:00:00 GMT"
+    assert b'"title":"DUNE"' in payload
+    assert b'"review_count":0' in payload
+    assert service.get_book.await_count == 2
+
+
+def test_conditional_get_matches_weak_etags_and_dates():
+    from starlette.requests import Request
+    from src.conditional import is_not_modified, make_etag
+
+    def request(**headers):
+        raw = [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]
+        return Request({"type": "http", "headers": raw})
+
+    etag = make_etag("2025-10-16 00:00:00", 3)
+    last_modified = "Thu, 16 Oct 2025 00:00:00 GMT"
+
+    assert is_not_modified(request(if_none_match=f'"x", {etag}'), etag, last_modified)
+    assert is_not_modified(request(if_none_match=etag.removeprefix("W/")), etag, None)
+    assert not is_not_modified(request(if_none_match='W/"stale"'), etag, last_modified)
+    assert is_not_modified(
+        request(if_modified_since="Fri, 17 Oct 2025 00:00:00 GMT"), etag, last_modified
+    )
+    assert not is_not_modified(
+        request(if_modified_since="Wed, 15 Oct 2025 00:00:00 GMT"), etag, last_modified
+    )
+
+
+def test_get_books_by_ids_keeps_request_order():
+    import asyncio
+    from unittest.mock import AsyncMock, Mock
+    from uuid import uuid4
+    from sqlalchemy.dialects import postgresql
+    from src.books.service import BookService
+
+    first, second, unknown = uuid4(), uuid4(), uuid4()
+    rows = [Mock(uid=second), Mock(uid=first)]
+    session = Mock()
+    session.exec = AsyncMock(return_value=Mock(all=Mock(return_value=rows)))
+
+    books = asyncio.run(
+        BookService().get_books_by_ids([first, unknown, second, first], session)
+    )
+
+    assert [book.uid for book in books] == [first, second]
+    sql = str(session.exec.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "books.uid = ANY (%(book_uids)s::UUID[])" in sql
+
+
+def test_leaderboards_rank_this_weeks_reviews(monkeypatch):
+    import asyncio
+    from datetime import datetime, timedelta, timezone
+    from fakeredis import FakeAsyncRedis
+    from src.db import redis as leaderboards
+
+    monkeypatch.setattr(leaderboards, "token_block_list", FakeAsyncRedis())
+    today = leaderboards.today_utc()
+    now = datetime.now(timezone.utc)
+
+    async def review(book, rating, previous=None, created_at=now):
+        await leaderboards.record_review_in_leaderboards(
+            book, rating, previous, created_at
+        )
+
+    async def scenario():
+        # too few reviews to be ranked as top rated yet
+        await review("new", 5)
+        for rating in (4, 5, 4):
+            await review("good", rating)
+        for rating in (5, 5, 4):
+            await review("best", rating)
+        await review("best", 5, previous=4)  # re-rated: 15 / 3
+
+        # "old" has more reviews, but nine days ago: outside both windows
+        monkeypatch.setattr(leaderboards, "today_utc", lambda: today - timedelta(9))
+        for _ in range(4):
+            await review("old", 5)
+        monkeypatch.setattr(leaderboards, "today_utc", lambda: today)
+        # re-rating a review from outside the window changes nothing
+        await review("old", 1, previous=5, created_at=now - timedelta(9))
+
+        top = await leaderboards.top_rated_book_uids(10)
+        trending = await leaderboards.trending_book_uids(2)
+        await leaderboards.remove_book_from_leaderboards("best")
+        return top, trending, await leaderboards.top_rated_book_uids(10)
+
+    top, trending, after_delete = asyncio.run(scenario())
+
+    assert top == ["best", "good"]
+    assert sorted(trending) == ["best", "good"]
+    assert after_delete == ["good"]
+    # a naive timestamp is read as UTC, whatever the server's zone
+    late = datetime(2025, 10, 16, 23, 30)
+    assert leaderboards.utc_day(late) == late.date()
+
+
+def test_page_etag_changes_when_a_rating_does():
+    from src.books.service import page_validators
+    from datetime import datetime
+    from types import SimpleNamespace
+    from uuid import uuid4
+
+    book = SimpleNamespace(
+        uid=uuid4(), update_at=datetime(2025, 10, 16), rating_count=2, rating_sum=7
+    )
+    page = {"items": [book], "next_cursor": None}
+    etag, last_modified = page_validators(page, 20, None)
+
+    # a review write moves the aggregates but never books.update_at
+    book.rating_count, book.rating_sum = 3, 12
+    assert page_validators(page, 20, None)[0] != etag
+    assert page_validators({**page, "next_cursor": "abc"}, 20, None)[0] != (
+        page_validators(page, 20, None)[0]
+    )
+    assert last_modified is None
+
+
+def test_import_reports_undecodable_and_oversized_lines(monkeypatch):
+    import asyncio
+    from src.books import importer
+
+    monkeypatch.setattr(importer, "MAX_LINE_BYTES", 64)
+    ndjson_body = [
+        b'{"title": "ok"}\n{"title": "caf\xe9"}\n',
+        b"x" * 50,
+        b"x" * 50,  # no newline yet: over the cap, the rest is skipped
+        b'xxx\n{"title": "after"}',
+    ]
+
+    async def body():
+        for chunk in ndjson_body:
+            yield chunk
+
+    async def collect(fmt):
+        return [pair async for pair in importer.iter_records(body(), fmt)]
+
+    rows = asyncio.run(collect("ndjson"))
+
+    assert rows[0] == (1, {"title": "ok"})
+    assert isinstance(rows[1][1], importer.RecordError)
+    assert "UTF-8" in str(rows[1][1])
+    assert rows[2][0] == 3 and "longer than 64" in str(rows[2][1])
+    assert rows[3] == (4, {"title": "after"})
+
+    # an unterminated quote stops buffering at the cap instead of at EOF
+    ndjson_body = [b'title\n"open\n', *[b"more text\n"] * 10, b'"closed"\n']
+    rows = asyncio.run(collect("csv"))
+    assert "quoted field longer than 64" in str(rows[0][1])
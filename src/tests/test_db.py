@@ -0,0 +1,120 @@
+from src.db.instrumentation import (
+    QueryStats,
+    instrument_engine,
+    query_stats,
+    report_n_plus_one,
+    server_timing,
+)
+from src import app
+from src.db.main import WriteSession
+from fastapi.testclient import TestClient
+from src.db.replica import RequestRouting, reads_from_primary, request_routing
+from src.db.pool import (
+    InstrumentedPool,
+    PoolStats,
+    ReplicaPool,
+    engine_options,
+    pool_stats,
+    pool_status,
+)
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.util import greenlet_spawn
+from sqlmodel.ext.asyncio.session import AsyncSession
+from types import SimpleNamespace
+from unittest.mock import Mock
+import asyncio
+import pytest
+
+
+def test_pool_counts_checkouts_and_timeouts(monkeypatch):
+    monkeypatch.setitem(pool_stats, "replica", PoolStats())
+    primary_checkouts = pool_stats["primary"].checkouts
+    # stub DBAPI connections; the pool only hands them out and takes them back
+    pool = ReplicaPool(Mock, pool_size=1, max_overflow=0, timeout=0.05)
+
+    def exhaust_pool():
+        conn = pool.connect()
+        busy = pool_status(pool)
+        with pytest.raises(exc.TimeoutError):
+            pool.connect()
+        conn.close()
+        return busy, pool_status(pool)
+
+    # the async-adapted queue waits through await_only, so run inside a greenlet
+    busy, idle = asyncio.run(greenlet_spawn(exhaust_pool))
+
+    assert busy["pool"] == "replica"
+    assert busy["checked_out"] == 1 and busy["size"] == 1
+    assert idle["checked_out"] == 0 and idle["idle"] == 1
+    assert idle["checkouts"] == 1 and idle["timeouts"] == 1
+    assert idle["wait_seconds_max"] >= 0
+    # the primary pool's figures are kept apart
+    assert pool_stats["primary"].checkouts == primary_checkouts
+
+
+def test_pgbouncer_mode_disables_prepared_statement_caches():
+    config = SimpleNamespace(
+        DB_POOL_SIZE=20,
+        DB_MAX_OVERFLOW=0,
+        DB_POOL_TIMEOUT=5,
+        DB_POOL_RECYCLE=-1,
+        DB_POOL_PRE_PING=False,
+        DB_STATEMENT_CACHE_SIZE=100,
+        DB_PGBOUNCER=True,
+    )
+
+    options = engine_options(config)
+
+    assert options["pool_size"] == 20 and options["poolclass"] is InstrumentedPool
+    assert options["connect_args"]["statement_cache_size"] == 0
+    assert options["connect_args"]["prepared_statement_cache_size"] == 0
+    name_func = options["connect_args"]["prepared_statement_name_func"]
+    assert name_func() != name_func()
+
+
+def test_commit_pins_the_request_to_the_primary():
+    async def write():
+        routing = RequestRouting()
+        request_routing.set(routing)
+        before = reads_from_primary()
+        # after_commit fires on any commit, so no database is needed
+        async with AsyncSession(sync_session_class=WriteSession) as session:
+            await session.commit()
+        return before, reads_from_primary()
+
+    assert asyncio.run(write()) == (False, True)
+
+    # a client carrying the pin cookie reads from the primary from the start
+    request_routing.set(RequestRouting(pinned=True))
+    assert reads_from_primary()
+    request_routing.set(None)
+    assert not reads_from_primary()
+
+
+def test_query_stats_count_statements_and_flag_repeats(caplog):
+    # the listeners sit on the sync engine, so the stdlib sqlite3 driver will do
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+
+    stats = QueryStats(track_statements=True)
+    token = query_stats.set(stats)
+    try:
+        with engine.connect() as conn:
+            for uid in range(3):
+                conn.execute(text("select :uid"), {"uid": uid})
+            conn.execute(text("select 1"))
+    finally:
+        query_stats.reset(token)
+        engine.dispose()
+
+    assert stats.count == 4
+    assert stats.seconds > 0
+    assert report_n_plus_one(stats, 3, "/books") == {"select ?": 3}
+    assert "possible N+1 on /books" in caplog.text
+    assert server_timing(stats, 0.25).endswith('queries", app;dur=250.0')
+
+
+def test_responses_carry_server_timing():
+    response = TestClient(app, base_url="http://localhost").get("/api/v1/books/top")
+
+    assert response.headers["Server-Timing"].startswith('db;dur=0.0;desc="0 queries"')
@@ -0,0 +1,83 @@
+from src import app
+from src.db.redis import InstrumentedRedis
+from src.metrics import REGISTRY
+from celery import Celery
+from fastapi.testclient import TestClient
+import asyncio
+
+client = TestClient(app, base_url="http://localhost")
+
+
+def sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_requests_are_counted_by_route_template():
+    labels = {"method": "GET", "route": "/api/v1/books/{book_uid}", "status": "401"}
+    before = sample("http_requests_total", labels)
+
+    client.get("/api/v1/books/5f0c2a8e-7f0a-4d8e-9c55-1c3e4b6a7d90")
+    client.get("/api/v1/books/0b6f7c1e-2d3a-4c5b-8e9f-a0b1c2d3e4f5")
+
+    assert sample("http_requests_total", labels) == before + 2
+
+    body = client.get("/metrics").text
+    assert 'route="/api/v1/books/{book_uid}"' in body
+    assert "http_requests_in_flight" in body
+    assert "db_pool_checked_out" in body
+
+
+def test_redis_commands_are_timed():
+    redis = InstrumentedRedis.from_url("redis://localhost:1")
+    labels = {"command": "GET"}
+    before = sample("redis_command_duration_seconds_count", labels)
+
+    async def get():
+        try:
+            await redis.get("missing")
+        except Exception:
+            pass  # no server here; the failed round trip is still timed
+        await redis.aclose()
+
+    asyncio.run(get())
+
+    assert sample("redis_command_duration_seconds_count", labels) == before + 1
+
+
+def test_celery_publish_latency_is_recorded():
+    celery_app = Celery(broker="memory://")
+
+    @celery_app.task(name="tests.noop")
+    def noop():
+        pass
+
+    before = sample("celery_enqueue_duration_seconds_count", {"task": "tests.noop"})
+    noop.delay()
+
+    assert (
+        sample("celery_enqueue_duration_seconds_count", {"task": "tests.noop"})
+        == before + 1
+    )
+
+
+def test_failed_publish_leaves_nothing_behind():
+    from src import metrics
+
+    metrics._task_publish_started(sender="tests.noop")
+    # the publish raised: no after_task_publish for it
+    metrics._task_publish_started(sender="tests.noop")
+    metrics._task_published(sender="tests.noop")
+
+    assert metrics._publish.started is None
+
+
+def test_exited_workers_gauges_are_dropped(tmp_path, monkeypatch):
+    from src import metrics
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    (tmp_path / "gauge_livesum_4242.db").write_bytes(b"")
+    (tmp_path / "counter_4242.db").write_bytes(b"")
+
+    metrics.mark_worker_dead(4242)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["counter_4242.db"]
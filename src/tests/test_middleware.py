@@ -0,0 +1,75 @@
+from src.access_log import (
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    access_logger,
+    should_log,
+)
+from src.middleware import AccessLogMiddleware
+import asyncio
+import json
+import logging
+import queue
+import time
+
+
+def test_queue_handler_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(1))
+    logger = logging.getLogger("bookly.tests.access")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        logger.warning({"path": "/a", "status": 200})
+        logger.warning({"path": "/b", "status": 200})
+    finally:
+        logger.removeHandler(handler)
+
+    assert handler.dropped == 1
+    line = json.loads(JsonFormatter().format(handler.queue.get_nowait()))
+    assert line["path"] == "/a" and line["level"] == "WARNING"
+
+
+def test_sampling_keeps_every_server_error():
+    assert all(should_log(503, 0.0) for _ in range(100))
+    assert not any(should_log(200, 0.0) for _ in range(100))
+    assert all(should_log(200, 1.0) for _ in range(100))
+
+
+def test_access_log_overhead_per_request(monkeypatch, record_property):
+    """Reports the middleware's cost over a bare ASGI app as the
+    `access_log_overhead_us` property (see --junitxml); timings vary too
+    much between machines to assert on"""
+    # keep the 2000 records out of the process-wide log queue and stdout
+    local = NonBlockingQueueHandler(queue.Queue())
+    monkeypatch.setattr(access_logger, "handlers", [local])
+
+    async def bare(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/bench",
+        "headers": [],
+        "client": ("127.0.0.1", 5000),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    async def run(app, requests=2000):
+        start = time.perf_counter()
+        for _ in range(requests):
+            await app(dict(scope), receive, send)
+        return (time.perf_counter() - start) / requests
+
+    bare_seconds = asyncio.run(run(bare))
+    wrapped_seconds = asyncio.run(run(AccessLogMiddleware(bare)))
+    record_property(
+        "access_log_overhead_us", round((wrapped_seconds - bare_seconds) * 1e6, 1)
+    )
+
+    assert local.queue.qsize() == 2000
@@ -0,0 +1,332 @@
+from src.config import Config
+from src import app
+from src.db.main import get_primary_read_session, get_read_session, get_session
+from src.reviews.service import ReviewService
+from src.db.models import User, BookModel, Review
+from src.auth.utils import create_access_token
+from src.tests.conftest import get_mock_session
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import AsyncMock
+from fakeredis import FakeAsyncRedis
+from datetime import date
+import asyncio
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def seeded(db_session):
+    user = User(
+        username="counter",
+        password_hash="x",
+        email="counter@example.com",
+        first_name="count",
+        last_name="er",
+        role="user",
+        is_verified=True,
+    )
+    book = BookModel(
+        title="QUERY BUDGETS",
+        author="TESTIE",
+        publisher="BOOKLY",
+        published_date=date(2025, 10, 16),
+        page_count=100,
+        language="English",
+        user=user,
+    )
+    # one review per user and book, so two more reviewers
+    reviewers = [user] + [
+        User(
+            username=f"reviewer{n}",
+            password_hash="x",
+            email=f"reviewer{n}@example.com",
+            first_name="re",
+            last_name="viewer",
+            role="user",
+            is_verified=True,
+        )
+        for n in range(2)
+    ]
+    reviews = [
+        Review(ratings=4, review_text="ok", user=reviewer, books=book)
+        for reviewer in reviewers
+    ]
+    db_session.add_all([*reviewers, book, *reviews])
+    await db_session.commit()
+    db_session.expunge_all()
+
+    return user, book
+
+
+@pytest.fixture
+async def api_client(db_session, monkeypatch):
+    async def get_db_session():
+        yield db_session
+
+    app.dependency_overrides[get_session] = get_db_session
+    app.dependency_overrides[get_read_session] = get_db_session
+    app.dependency_overrides[get_primary_read_session] = get_db_session
+    monkeypatch.setattr(
+        "src.auth.dependencies.token_in_blocklist", AsyncMock(return_value=False)
+    )
+    monkeypatch.setattr("src.db.redis.token_block_list", FakeAsyncRedis())
+    # repeated statements inside one request get logged as likely N+1s
+    monkeypatch.setattr(Config, "SQL_DETECT_N_PLUS_ONE", True)
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://localhost"
+    ) as client:
+        yield client
+
+    app.dependency_overrides[get_session] = get_mock_session
+    app.dependency_overrides[get_read_session] = get_mock_session
+    app.dependency_overrides[get_primary_read_session] = get_mock_session
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        # principal lookup + page query
+        ("/api/v1/books/", 2),
+        ("/api/v1/books/user/{user_uid}", 2),
+        # principal lookup + book + one query for its newest reviews
+        ("/api/v1/books/{book_uid}", 3),
+        ("/api/v1/reviews/book/{book_uid}", 2),
+        ("/api/v1/reviews/book/{book_uid}?sort=rating", 2),
+        # principal lookup + user + one selectin each for books and reviews
+        ("/api/v1/auth/me", 4),
+    ],
+)
+async def test_endpoint_statement_count(
+    seeded, api_client, statement_log, path, expected
+):
+    user, book = seeded
+    token = create_access_token(
+        user_data={"email": user.email, "user_uid": str(user.uid), "role": user.role}
+    )
+    statement_log.clear()
+
+    response = await api_client.get(
+        path.format(user_uid=user.uid, book_uid=book.uid),
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert len(statement_log) == expected, statement_log
+
+
+async def test_create_book_is_one_insert(seeded, api_client, statement_log):
+    user, book = seeded
+    token = create_access_token(
+        user_data={"email": user.email, "user_uid": str(user.uid), "role": user.role}
+    )
+    new_book = {
+        "title": "Query Budgets II",
+        "author": "Testie",
+        "publisher": "Bookly",
+        "published_date": "2025-10-28",
+        "page_count": 120,
+        "language": "English",
+    }
+    statement_log.clear()
+
+    created = await api_client.post(
+        "/api/v1/books/create",
+        json=new_book,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    duplicate = await api_client.post(
+        "/api/v1/books/create",
+        json={**new_book, "title": " query budgets ii "},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert created.status_code == 201
+    assert duplicate.status_code == 400
+    # one principal lookup, then cached; one INSERT ... ON CONFLICT per request
+    assert len(statement_log) == 1 + 2, statement_log
+
+
+async def test_update_and_delete_are_one_statement_each(
+    seeded, api_client, statement_log
+):
+    user, book = seeded
+    token = create_access_token(
+        user_data={"email": user.email, "user_uid": str(user.uid), "role": user.role}
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    statement_log.clear()
+
+    updated = await api_client.patch(
+        f"/api/v1/books/update/{book.uid}",
+        json={
+            "title": "QUERY BUDGETS",
+            "author": "TESTIE",
+            "publisher": "BOOKLY PRESS",
+            "page_count": 101,
+            "language": "English",
+        },
+        headers=headers,
+    )
+    deleted = await api_client.delete(f"/api/v1/books/delete/{book.uid}", headers=headers)
+    missing = await api_client.delete(f"/api/v1/books/delete/{book.uid}", headers=headers)
+
+    assert updated.status_code == 200
+    assert updated.json()["publisher"] == "BOOKLY PRESS"
+    assert deleted.status_code == 204
+    assert missing.status_code == 404
+    # one principal lookup, then cached; one UPDATE/DELETE ... RETURNING per
+    # request, regardless of the three reviews attached to the book
+    assert len(statement_log) == 1 + 3, statement_log
+
+
+async def test_batch_fetch_loads_reviews_in_one_query(
+    seeded, api_client, statement_log
+):
+    user, book = seeded
+    token = create_access_token(
+        user_data={"email": user.email, "user_uid": str(user.uid), "role": user.role}
+    )
+    statement_log.clear()
+
+    response = await api_client.post(
+        "/api/v1/books/batch",
+        json={"uids": [str(book.uid), str(user.uid)], "include_reviews": True},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert len(response.json()["items"][0]["reviews"]) == 3
+    assert response.json()["missing"] == [str(user.uid)]
+    # principal lookup + books + one query for all of their newest reviews
+    assert len(statement_log) == 3, statement_log
+
+
+async def test_review_write_is_one_statement(seeded, api_client, statement_log):
+    user, book = seeded
+    token = create_access_token(
+        user_data={"email": user.email, "user_uid": str(user.uid), "role": user.role}
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    statement_log.clear()
+
+    updated = await api_client.post(
+        f"/api/v1/reviews/{book.uid}",
+        json={"ratings": 2, "review_text": "less good on reread"},
+        headers=headers,
+    )
+    missing = await api_client.post(
+        f"/api/v1/reviews/{user.uid}",
+        json={"ratings": 5, "review_text": "no such book"},
+        headers=headers,
+    )
+
+    assert updated.status_code == 200
+    assert missing.status_code == 404
+    # an advisory lock and one upsert per write, taking the user from the token
+    assert len(statement_log) == 2 * 2, statement_log
+    assert updated.json()["ratings"] == 2
+
+
+async def test_histogram_is_read_from_the_summary_table(
+    seeded, api_client, db_session, statement_log
+):
+    user, book = seeded
+    await ReviewService().rebuild_rating_histograms(db_session)
+    token = create_access_token(
+        user_data={"email": user.email, "user_uid": str(user.uid), "role": user.role}
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    statement_log.clear()
+
+    before = await api_client.get(
+        f"/api/v1/reviews/book/{book.uid}/histogram", headers=headers
+    )
+    await api_client.post(
+        f"/api/v1/reviews/{book.uid}",
+        json={"ratings": 1, "review_text": "changed my mind"},
+        headers=headers,
+    )
+    after = await api_client.get(
+        f"/api/v1/reviews/book/{book.uid}/histogram", headers=headers
+    )
+
+    assert before.json()["stars_4"] == 3
+    assert after.json()["stars_4"] == 2 and after.json()["stars_1"] == 1
+    assert after.json()["total"] == 3
+    # one principal lookup, then cached; one primary key read per histogram
+    # and a lock plus one upsert per write
+    assert len(statement_log) == 1 + 2 + 2, statement_log
+
+
+async def test_principal_is_cached_until_the_user_changes(
+    seeded, api_client, db_session, statement_log
+):
+    from src.auth.service import UserService
+
+    user, book = seeded
+    token = create_access_token(
+        user_data={"email": user.email, "user_uid": str(user.uid), "role": user.role}
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    statement_log.clear()
+
+    for _ in range(3):
+        response = await api_client.get("/api/v1/books/", headers=headers)
+        assert response.status_code == 200
+    # principal lookup once, then only the page query
+    assert len(statement_log) == 1 + 3, statement_log
+
+    db_user = await UserService().get_user_by_email(user.email, db_session)
+    await UserService().update_user(db_user, {"role": "banned"}, db_session)
+    response = await api_client.get("/api/v1/books/", headers=headers)
+    assert response.status_code == 401  # InsufficientPermission
+
+
+async def test_concurrent_first_reviews_count_once(seeded, db_session, monkeypatch):
+    from src.books.service import BookService
+    from src.db.models import BookRatingHistogram
+    from src.reviews.schemas import ReviewCreateModel
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    user, book = seeded
+    monkeypatch.setattr("src.db.redis.token_block_list", FakeAsyncRedis())
+    # the seed adds reviews directly, so bring the summaries in line first
+    await BookService().backfill_rating_aggregates(db_session)
+    await ReviewService().rebuild_rating_histograms(db_session)
+    newcomer = User(
+        username="doubleclick",
+        password_hash="x",
+        email="doubleclick@example.com",
+        first_name="double",
+        last_name="click",
+        role="user",
+        is_verified=True,
+    )
+    db_session.add(newcomer)
+    await db_session.commit()
+
+    sessions = async_sessionmaker(
+        db_session.bind, class_=AsyncSession, expire_on_commit=False
+    )
+
+    async def submit(ratings):
+        async with sessions() as session:
+            return await ReviewService().add_review_to_book(
+                newcomer.uid,
+                book.uid,
+                ReviewCreateModel(ratings=ratings, review_text="double click"),
+                session,
+            )
+
+    # a double-click: two first submissions of the same review at once
+    await asyncio.gather(submit(2), submit(2))
+
+    db_session.expunge_all()
+    stored = await db_session.get(BookModel, book.uid)
+    histogram = await db_session.get(BookRatingHistogram, book.uid)
+    assert stored.rating_count == 4
+    assert stored.rating_sum == 4 * 3 + 2
+    assert histogram.stars_2 == 1 and histogram.stars_4 == 3
@@ -0,0 +1,151 @@
+from src.auth.service import UserService, principal_cache
+from src.books.schemas import BookCreateModel, BookUpdateModel
+from src.books.service import BookService
+from src.reviews.schemas import ReviewCreateModel
+from src.reviews.service import ReviewService
+from src.tests.test_query_counts import seeded  # noqa: F401 (fixture)
+from fakeredis import FakeAsyncRedis
+from sqlalchemy import event
+from datetime import date
+import json
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+book_service = BookService()
+user_service = UserService()
+review_service = ReviewService()
+
+# Every query a service emits on a request path, as (name, call). Exports,
+# backfills and rebuilds read whole tables on purpose and are left out.
+SERVICE_CALLS = [
+    ("BookService.get_all_books", lambda s, u, b: book_service.get_all_books(s)),
+    (
+        "BookService.get_user_books",
+        lambda s, u, b: book_service.get_user_books(u.uid, s),
+    ),
+    (
+        "BookService.search_books",
+        lambda s, u, b: book_service.search_books("budgets", s),
+    ),
+    ("BookService.suggest", lambda s, u, b: book_service.suggest("title", "que", s)),
+    (
+        "BookService.get_book",
+        lambda s, u, b: book_service.get_book(b.uid, s, with_reviews=True),
+    ),
+    (
+        "BookService.get_books_by_ids",
+        lambda s, u, b: book_service.get_books_by_ids([b.uid], s, with_reviews=True),
+    ),
+    (
+        "BookService.get_book_detail_validators",
+        lambda s, u, b: book_service.get_book_detail_validators(b.uid, s),
+    ),
+    (
+        "BookService.create_book",
+        lambda s, u, b: book_service.create_book(
+            BookCreateModel(
+                title="Plans",
+                author="Testie",
+                publisher="Bookly",
+                published_date=date(2025, 10, 16),
+                page_count=10,
+                language="English",
+            ),
+            u.uid,
+            s,
+        ),
+    ),
+    (
+        "BookService.update_book",
+        lambda s, u, b: book_service.update_book(
+            b.uid,
+            BookUpdateModel(
+                title="QUERY BUDGETS",
+                author="TESTIE",
+                publisher="BOOKLY",
+                page_count=100,
+                language="English",
+            ),
+            s,
+        ),
+    ),
+    ("BookService.delete_book", lambda s, u, b: book_service.delete_book(b.uid, s)),
+    (
+        "UserService.get_user_by_email",
+        lambda s, u, b: user_service.get_user_by_email(u.email, s),
+    ),
+    (
+        "UserService.get_user_by_username",
+        lambda s, u, b: user_service.get_user_by_username(u.username, s),
+    ),
+    ("UserService.get_principal", lambda s, u, b: user_service.get_principal(u.uid, s)),
+    (
+        "UserService.get_current_user_details",
+        lambda s, u, b: user_service.get_current_user_details(u, s),
+    ),
+    (
+        "ReviewService.get_book_reviews",
+        lambda s, u, b: review_service.get_book_reviews(b.uid, s),
+    ),
+    (
+        "ReviewService.get_book_reviews(rating)",
+        lambda s, u, b: review_service.get_book_reviews(b.uid, s, sort="rating"),
+    ),
+    (
+        "ReviewService.get_rating_histogram",
+        lambda s, u, b: review_service.get_rating_histogram(b.uid, s),
+    ),
+    (
+        "ReviewService.add_review_to_book",
+        lambda s, u, b: review_service.add_review_to_book(
+            u.uid, b.uid, ReviewCreateModel(ratings=2, review_text="again"), s
+        ),
+    ),
+]
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Relations read by a sequential scan anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+@pytest.mark.parametrize("name, call", SERVICE_CALLS, ids=[n for n, _ in SERVICE_CALLS])
+async def test_service_queries_use_an_index(seeded, db_session, monkeypatch, name, call):
+    user, book = seeded
+    monkeypatch.setattr("src.db.redis.token_block_list", FakeAsyncRedis())
+    principal_cache.clear()
+
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    sync_engine = db_session.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", record)
+    try:
+        await call(db_session, user, book)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", record)
+
+    assert executed, f"{name} ran no queries"
+
+    # with sequential scans priced out, the planner still picks one only
+    # when no index can serve the query; the seeded tables are tiny
+    conn = await db_session.connection()
+    await conn.exec_driver_sql("SET enable_seqscan = off")
+    for statement, parameters in executed:
+        result = await conn.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}", parameters
+        )
+        plan = result.scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+
+        assert not seq_scans(plan[0]["Plan"]), f"{name}: {statement}"
+
+    await db_session.rollback()
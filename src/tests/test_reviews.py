@@ -0,0 +1,110 @@
+from src.reviews.schemas import ReviewCreateModel
+from src.reviews.service import ReviewService
+from unittest.mock import AsyncMock, Mock
+from uuid import uuid4
+import asyncio
+
+
+def test_review_write_is_one_upsert_that_applies_the_rating_delta(monkeypatch):
+    from sqlalchemy.dialects import postgresql
+
+    book_uid, user_uid = uuid4(), uuid4()
+    row = {
+        "uid": uuid4(),
+        "ratings": 5,
+        "review_text": "better on reread",
+        "user_uid": user_uid,
+        "book_uid": book_uid,
+        "created_at": None,
+        "update_at": None,
+        "rating_count": 4,
+        "rating_avg": 4.25,
+        "previous_rating": 2,
+    }
+    record = AsyncMock()
+    monkeypatch.setattr("src.reviews.service.record_review_in_leaderboards", record)
+    monkeypatch.setattr(
+        "src.reviews.service.book_service", Mock(invalidate_book_detail=AsyncMock())
+    )
+    session = Mock(commit=AsyncMock())
+    session.exec = AsyncMock(
+        return_value=Mock(mappings=Mock(return_value=Mock(one=Mock(return_value=row))))
+    )
+
+    review = asyncio.run(
+        ReviewService().add_review_to_book(
+            user_uid=user_uid,
+            book_uid=book_uid,
+            review_data=ReviewCreateModel(ratings=5, review_text="better on reread"),
+            session=session,
+        )
+    )
+
+    # the per (book, user) lock, then the one upsert statement
+    assert session.exec.await_count == 2
+    lock, upsert = (call.args[0] for call in session.exec.call_args_list)
+    assert "pg_advisory_xact_lock" in str(lock.compile(dialect=postgresql.dialect()))
+    sql = str(upsert.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (book_uid, user_uid) DO UPDATE" in sql
+    assert "UPDATE books SET rating_count" in sql
+    assert "INSERT INTO book_rating_histogram" in sql
+    assert review["ratings"] == 5 and "rating_count" not in review
+    record.assert_awaited_once_with(book_uid, 5, 2, None)
+
+
+def test_review_pages_sorted_by_rating_carry_the_rating_in_the_cursor():
+    from datetime import datetime
+    from sqlalchemy.dialects import postgresql
+
+    rows = [
+        Mock(uid=uuid4(), ratings=rating, created_at=datetime(2025, 10, day))
+        for rating, day in [(5, 3), (4, 2), (4, 1)]
+    ]
+    session = Mock()
+    session.exec = AsyncMock(return_value=Mock(all=Mock(return_value=rows)))
+    service = ReviewService()
+
+    page = asyncio.run(service.get_book_reviews(uuid4(), session, "rating", limit=2))
+    assert page["items"] == rows[:2]
+
+    asyncio.run(
+        service.get_book_reviews(uuid4(), session, "rating", cursor=page["next_cursor"])
+    )
+    statement = session.exec.call_args.args[0]
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "(reviews.ratings, reviews.created_at, reviews.uid) <" in sql
+    assert "ORDER BY reviews.ratings DESC, reviews.created_at DESC" in sql
+    assert statement.compile().params["param_1"] == 4
+
+
+def test_rating_cursors_with_tampered_sort_keys_are_rejected():
+    import pytest
+    from datetime import datetime
+    from src.db.pagination import encode_cursor
+    from src.errors import InvalidCursor
+
+    session = Mock(exec=AsyncMock())
+    for sort_key in ["5", {"$gt": 1}, True, 6, 0, 4.5]:
+        cursor = encode_cursor(datetime(2025, 10, 1), uuid4(), sort_key)
+        with pytest.raises(InvalidCursor):
+            asyncio.run(
+                ReviewService().get_book_reviews(
+                    uuid4(), session, "rating", cursor=cursor
+                )
+            )
+
+    session.exec.assert_not_awaited()
+
+
+def test_rating_histogram_totals_the_five_counters():
+    book_uid = uuid4()
+    row = Mock(
+        _mapping={"stars_1": 1, "stars_2": 0, "stars_3": 2, "stars_4": 4, "stars_5": 3}
+    )
+    session = Mock()
+    session.exec = AsyncMock(return_value=Mock(first=Mock(return_value=row)))
+
+    histogram = asyncio.run(ReviewService().get_rating_histogram(book_uid, session))
+
+    assert histogram["total"] == 10
+    assert histogram["stars_4"] == 4 and histogram["book_uid"] == book_uid